@@ -0,0 +1,143 @@
+"""
+Single-pass tokenizer for sample files ("{id,id,...} ... type" lines), compiled with Numba.
+
+It only accepts the plain format: ASCII, "\n" or "\r\n" line ends, optional blank lines,
+"{" at the start of a line (after blanks), comma-separated decimal ids of at most 18 digits,
+and an integer as the last whitespace-separated token after "}". Anything else makes it give
+up (ok=False), and the caller falls back to its general parser, so results never differ.
+
+Without numba `parse_trace` is a plain Python loop over a NumPy array (very slow); callers
+should check HAS_NUMBA and keep their own path in that case.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+
+    HAS_NUMBA = True
+except ImportError:  # graceful degradation: plain Python functions
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+
+_NL, _CR, _OPEN, _CLOSE, _COMMA, _HASH, _PLUS, _MINUS, _ZERO = 10, 13, 123, 125, 44, 35, 43, 45, 48
+# Longest id / type accepted (anything longer might not fit in int64)
+_MAX_DIGITS = 18
+
+
+@njit(cache=True)
+def _is_blank(c):
+    """Whitespace other than the newline: space, \\t, \\v, \\f, \\r (only ever seen before \\n)"""
+    return c == 32 or (9 <= c <= 13 and c != _NL)
+
+
+@njit(cache=True)
+def _parse_int(buf, i, end):
+    """
+    Parse [+-]digits in buf[i:end] (whole span). Returns (ok, value).
+    """
+    neg = False
+    if i < end and (buf[i] == _PLUS or buf[i] == _MINUS):
+        neg = buf[i] == _MINUS
+        i += 1
+    if i >= end or end - i > _MAX_DIGITS:
+        return False, 0
+    v = 0
+    while i < end:
+        d = buf[i] - _ZERO
+        if d < 0 or d > 9:
+            return False, 0
+        v = v * 10 + d
+        i += 1
+    return True, -v if neg else v
+
+
+@njit(cache=True)
+def parse_trace(buf):
+    """
+    buf: uint8 array holding the file bytes.
+    Returns (ok, ids, counts, req_types): all ids in file order (int64), the number of ids of
+    every record, and every record's request type. ok is False if buf is not in the plain
+    format (the arrays are then empty).
+    """
+    n = buf.shape[0]
+    empty = np.zeros(0, dtype=np.int64)
+    # Pass 1: reject comments / control / non-ASCII bytes / bare "\r" line ends and size the outputs
+    n_open = 0
+    n_comma = 0
+    for i in range(n):
+        c = buf[i]
+        if c == _OPEN:
+            n_open += 1
+        elif c == _COMMA:
+            n_comma += 1
+        elif c == _HASH or c >= 128 or (c < 32 and not (9 <= c <= 13)):
+            return False, empty, empty, empty
+        elif c == _CR and (i + 1 == n or buf[i + 1] != _NL):
+            return False, empty, empty, empty
+    ids = np.empty(n_open + n_comma, dtype=np.int64)
+    counts = np.empty(n_open, dtype=np.int64)
+    req_types = np.empty(n_open, dtype=np.int64)
+
+    # Pass 2: one record per non-blank line
+    n_ids = 0
+    n_rec = 0
+    i = 0
+    while i < n:
+        c = buf[i]
+        if c == _NL or _is_blank(c):
+            i += 1
+            continue
+        if c != _OPEN:
+            return False, empty, empty, empty
+        i += 1
+        first_id = n_ids
+        # Ids: "{}", "{ }" or "{ a , b ,c }"
+        while i < n and _is_blank(buf[i]):
+            i += 1
+        if i < n and buf[i] == _CLOSE:
+            i += 1
+        else:
+            while True:
+                while i < n and _is_blank(buf[i]):
+                    i += 1
+                start = i
+                while i < n and (buf[i] == _PLUS or buf[i] == _MINUS or _ZERO <= buf[i] <= _ZERO + 9):
+                    i += 1
+                ok, v = _parse_int(buf, start, i)
+                if not ok:
+                    return False, empty, empty, empty
+                ids[n_ids] = v
+                n_ids += 1
+                while i < n and _is_blank(buf[i]):
+                    i += 1
+                if i < n and buf[i] == _COMMA:
+                    i += 1
+                elif i < n and buf[i] == _CLOSE:
+                    i += 1
+                    break
+                else:
+                    return False, empty, empty, empty
+        # Rest of the line: the request type is its last whitespace-separated token
+        tok_start = -1
+        tok_end = -1
+        while i < n and buf[i] != _NL:
+            if _is_blank(buf[i]):
+                i += 1
+                continue
+            tok_start = i
+            while i < n and buf[i] != _NL and not _is_blank(buf[i]):
+                i += 1
+            tok_end = i
+        ok, v = _parse_int(buf, tok_start, tok_end)
+        if tok_start < 0 or not ok:
+            return False, empty, empty, empty
+        counts[n_rec] = n_ids - first_id
+        req_types[n_rec] = v
+        n_rec += 1
+    return True, ids[:n_ids], counts[:n_rec], req_types[:n_rec]
@@ -0,0 +1,44 @@
+"""
+Contiguous-run offsets for `S3FIFO_Attn`, compiled with Numba when it is available.
+
+Without numba `compute_offsets` is a plain Python loop over a NumPy array (slow); callers
+should check HAS_NUMBA and keep their own pure-Python path in that case.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+
+    HAS_NUMBA = True
+except ImportError:  # graceful degradation: plain Python functions
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+
+@njit(cache=True)
+def compute_offsets(seq):
+    """
+    seq: int64 array of prefix hash ids. Returns an int64 array where out[i] is the index
+    of seq[i]'s contiguous run (x[i] == x[i-1]+1) counted from the last run, capped at 3.
+    """
+    n = seq.shape[0]
+    out = np.empty(n, dtype=np.int64)
+    if n == 0:
+        return out
+    # Pass 1: run id of every element
+    run_id = 0
+    out[0] = 0
+    for i in range(1, n):
+        if seq[i] != seq[i - 1] + 1:
+            run_id += 1
+        out[i] = run_id
+    # Pass 2: turn run ids into capped offsets from the tail
+    for i in range(n):
+        off = run_id - out[i]
+        out[i] = off if off < 3 else 3
+    return out
@@ -1,9 +1,13 @@
+from typing import List, Sequence
+
 from kvstore import KVCacheStore
 
 
 class KVCachePolicy:
     """Base class for KV cache policies."""
 
+    __slots__ = ("store",)
+
     def __init__(self, store: KVCacheStore):
         self.store = store
 
@@ -13,3 +17,21 @@ class KVCachePolicy:
         Returns True if it's a cache hit, False if it's a miss.
         """
         raise NotImplementedError("access method must be implemented by subclasses")
+
+    def access_many(
+        self, keys: Sequence[int], request_prefix_hash_ids=None, request_type=None
+    ) -> List[bool]:
+        """
+        Access the cache with each key in order (typically every key of one request).
+        Returns one hit flag per key. Subclasses may override this with a tighter loop.
+        """
+        access = self.access
+        return [access(key, request_prefix_hash_ids, request_type) for key in keys]
+
+    def access_prefix(self, prefix_ids: Sequence[int], request_type=None) -> int:
+        """
+        Access every key of one request prefix in order (the prefix is also passed as
+        request_prefix_hash_ids). Returns the number of hits. Subclasses may override this
+        with a loop that only counts hits.
+        """
+        return sum(self.access_many(prefix_ids, prefix_ids, request_type))
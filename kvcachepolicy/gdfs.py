@@ -1,7 +1,11 @@
-from typing import Dict, Any
-import heapq
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
 from kvstore import KVCacheStore
-from kvcachepolicy import KVCachePolicy
+from kvcachepolicy.base import KVCachePolicy
+
+# 每单位优先级的桶数：桶号 = int(priority * _BUCKETS_PER_UNIT)
+_BUCKETS_PER_UNIT = 256
 
 
 class GDFS(KVCachePolicy):
@@ -20,25 +24,58 @@ class GDFS(KVCachePolicy):
         PosBonus = pos_alpha * ((n - i) / n)
 
     注意：当前 `KVCacheStore` 的容量按“项数”计。pos_alpha 可调，默认 2。
+
+    最小优先级用按 int(Priority * 256) 分桶的桶队列维护：桶足够细，桶间顺序即优先级顺序，
+    同一桶内按进入桶的先后（FIFO）淘汰；命中时只在桶间移动该 key，因此访问为 O(1)，且结构大小只与驻留项数相关。
+
+    每个驻留对象占用一个槽位（slot），freq / priority 以结构数组（SoA）形式按槽位存放，
+    避免每个 key 一个 dict 的内存与分配开销。
     """
 
+    __slots__ = (
+        "_resident",
+        "clock",
+        "_buckets",
+        "_min_bucket",
+        "_key2slot",
+        "_freq",
+        "_priority",
+        "_free_slots",
+        "total",
+        "used",
+        "pos_alpha",
+        "_pos_cache_req",
+        "_pos_cache_map",
+    )
+
     def __init__(
         self,
         store: KVCacheStore,
         pos_alpha: float = 1,
     ):
         self.store = store
+        # 与 store 共享的驻留集合，命中判断直接查集合
+        self._resident = store.resident
         # 全局时钟（最近一次被淘汰对象的优先级）
         self.clock: float = 0.0
-        # 最小堆，元素为 (priority, version, key)
-        self._heap: list[tuple[float, int, int]] = []
-        # 元信息：key -> {freq, version, priority}
-        self._meta: Dict[int, Dict[str, Any]] = {}
+        # 桶队列：int(priority * _BUCKETS_PER_UNIT) -> OrderedDict[key, None]（桶内按进入顺序）
+        self._buckets: Dict[int, OrderedDict] = {}
+        # 当前最小的非空桶号（下界，查询时向前推进）
+        self._min_bucket: int = 0
+        # 元信息（SoA）：key -> slot，freq / priority 按 slot 存放；空闲 slot 复用
+        self._key2slot: Dict[int, int] = {}
+        self._freq = array("l")
+        self._priority = array("d")
+        self._free_slots: List[int] = []
         # 容量（Total）与当前使用（Used，按项数计）
         self.total: int = int(self.store.capacity)
         self.used: int = int(self.store.size())
         # 位置加成系数
         self.pos_alpha: float = float(pos_alpha)
+        # 按请求缓存的位置加成：request_prefix_hash_ids -> {key: PosBonus}
+        # 持有列表本身并按 is 比较：只存 id() 时列表释放后地址会被新列表复用，命中错误的缓存
+        self._pos_cache_req: Optional[List[int]] = None
+        self._pos_cache_map: Dict[int, float] = {}
 
     # ------------------------------ 公共接口 ------------------------------
     def access(self, key: int, request_prefix_hash_ids, request_type) -> bool:
@@ -49,21 +86,21 @@ class GDFS(KVCachePolicy):
         # ----------------------
         # 1) 命中：更新频次和优先级
         # ----------------------
-        if self.store.contains(key):
-            meta = self._meta.get(key)
-            if meta is None:
-                # 兜底：若 Store 里已有但没有 meta（极少发生），用默认值补建。
-                meta = {"freq": 0, "version": 0, "priority": 0.0}
-                self._meta[key] = meta
-
-            meta["freq"] += 1
+        if key in self._resident:
+            slot = self._key2slot.get(key)
+            if slot is None:
+                # 兜底：若 Store 里已有但没有元信息（极少发生），用默认值补建。
+                slot = self._alloc_slot(key, 0, 0.0)
+            else:
+                self._bucket_remove(key, self._priority[slot])
+
+            freq = self._freq[slot] + 1
+            self._freq[slot] = freq
             pos_bonus = self._position_bonus(key, request_prefix_hash_ids)
-            prio = self._calc_priority(
-                meta["freq"], pos_bonus
-            )  # Priority = Clock + Fr + PosBonus
-            meta["priority"] = prio
-            meta["version"] += 1
-            heapq.heappush(self._heap, (prio, meta["version"], key))
+            # 统一 Cost=1, Size=1 时：Priority = Clock + Fr + PosBonus
+            prio = self.clock + freq + pos_bonus
+            self._priority[slot] = prio
+            self._bucket_push(key, prio)
             return True
 
         # ----------------------
@@ -71,7 +108,7 @@ class GDFS(KVCachePolicy):
         # ----------------------
         freq = 1
         pos_bonus = self._position_bonus(key, request_prefix_hash_ids)
-        prio_new = self._calc_priority(freq, pos_bonus)
+        prio_new = self.clock + freq + pos_bonus
 
         # 2.1 空间足够：直接接纳
         if self.used < self.total:
@@ -90,62 +127,109 @@ class GDFS(KVCachePolicy):
             return False
 
         # 否则驱逐最小优先级对象并接纳新对象（C1）
-        self._evict_key(victim, evicted_priority=min_pr)
-        self._admit_new(key, freq, prio_new)
+        self._replace_min(victim, min_pr, key, freq, prio_new)
         return False
 
     def current_keys(self):
         # 返回当前在缓存中的 key 列表（无序）。
-        return list(self._meta.keys())
+        return list(self._key2slot.keys())
 
     # ------------------------------ 内部方法 ------------------------------
-    def _calc_priority(self, freq: float, pos_bonus: float) -> float:
-        # 统一 Cost=1, Size=1 时：Priority = Clock + Fr + PosBonus
-        return self.clock + float(freq) + float(pos_bonus)
-
     def _position_bonus(self, key: int, request_prefix_hash_ids) -> float:
         """基于 key 在本次请求列表中的相对位置计算位置加成（越靠近头部加成越高）。
 
         设列表长度为 n，key 的索引为 i（0-based）。
         PosBonus = pos_alpha * ((n - i) / n)。若 key 未出现在列表（理论不该发生），返回 0。
+        同一请求（列表对象不变）内只构建一次 {key: PosBonus}，之后每次访问为 O(1) 查表。
         """
-        ids = request_prefix_hash_ids or []
-        n = len(ids)
-        if n <= 0:
-            return 0.0
-        try:
-            i = ids.index(key)
-        except ValueError:
+        if not request_prefix_hash_ids:
             return 0.0
-        return self.pos_alpha * ((n - i) / n)
+        if self._pos_cache_req is not request_prefix_hash_ids:
+            self._pos_cache_map = self._compute_position_bonus(request_prefix_hash_ids)
+            self._pos_cache_req = request_prefix_hash_ids
+        return self._pos_cache_map.get(key, 0.0)
+
+    def _compute_position_bonus(self, ids) -> Dict[int, float]:
+        """为整个请求计算 {key: PosBonus}；重复出现的 key 取首次出现的位置（与 list.index 一致）。"""
+        n = len(ids)
+        alpha = self.pos_alpha
+        out: Dict[int, float] = {}
+        for i, k in enumerate(ids):
+            if k not in out:
+                out[k] = alpha * ((n - i) / n)
+        return out
 
     def _peek_valid_min(self) -> tuple[float | None, int | None]:
-        """返回堆中当前有效的最小 (priority, key)。遇到失效条目时会弹出并继续检查。"""
-        while self._heap:
-            prio, ver, k = self._heap[0]
-            meta = self._meta.get(k)
-            if (
-                meta is not None
-                and ver == meta.get("version")
-                and self.store.contains(k)
-            ):
-                return prio, k
-            # 失效：弹出丢弃
-            heapq.heappop(self._heap)
-        return None, None
+        """返回最小非空桶中最早进入的 (priority, key)；缓存为空时返回 (None, None)。"""
+        buckets = self._buckets
+        if not buckets:
+            return None, None
+        b = self._min_bucket
+        while b not in buckets:
+            b += 1
+        self._min_bucket = b
+        k = next(iter(buckets[b]))
+        return self._priority[self._key2slot[k]], k
+
+    def _bucket_push(self, key: int, prio: float) -> None:
+        """将 key 追加到 prio 对应桶的末尾。"""
+        b = int(prio * _BUCKETS_PER_UNIT)
+        bucket = self._buckets.get(b)
+        if bucket is None:
+            bucket = self._buckets[b] = OrderedDict()
+            if b < self._min_bucket or len(self._buckets) == 1:
+                self._min_bucket = b
+        bucket[key] = None
+
+    def _bucket_remove(self, key: int, prio: float) -> None:
+        """从 prio 对应的桶中移除 key；桶为空时一并删除。"""
+        b = int(prio * _BUCKETS_PER_UNIT)
+        bucket = self._buckets[b]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[b]
+
+    def _alloc_slot(self, key: int, freq: int, prio: float) -> int:
+        """为 key 分配槽位（优先复用空闲槽位，否则追加），并写入 freq / priority。"""
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._freq[slot] = freq
+            self._priority[slot] = prio
+        else:
+            slot = len(self._freq)
+            self._freq.append(freq)
+            self._priority.append(prio)
+        self._key2slot[key] = slot
+        return slot
 
     def _admit_new(self, key: int, freq: int, prio: float) -> None:
-        """将新对象接纳进缓存，并入堆。"""
-        meta = {"freq": int(freq), "version": 0, "priority": float(prio)}
-        self._meta[key] = meta
+        """将新对象接纳进缓存，并放入对应优先级桶。"""
+        self._alloc_slot(key, freq, prio)
         self.store.add(key)
         self.used += 1
-        heapq.heappush(self._heap, (prio, meta["version"], key))
+        self._bucket_push(key, prio)
+
+    def _replace_min(
+        self, victim: int, evicted_priority: float, key: int, freq: int, prio: float
+    ) -> None:
+        """驱逐当前最小对象 victim 并在同一步接纳新对象（类似堆的 heapreplace）。
 
-    def _evict_key(self, victim: int, evicted_priority: float) -> None:
-        """从缓存驱逐给定键，并更新 Clock。"""
+        victim 必为最小桶的队首，直接 popitem 出桶；其槽位原地交给新对象，不经过空闲链表。
+        Used 不变（一出一进）。
+        """
+        b = self._min_bucket
+        bucket = self._buckets[b]
+        bucket.popitem(last=False)
+        if not bucket:
+            del self._buckets[b]
         self.store.delete(victim)
-        self._meta.pop(victim, None)
-        self.used = max(0, self.used - 1)
+        slot = self._key2slot.pop(victim)
         # 伪代码 4：Clock = max{Pr(被驱逐集合)}；按项数容量一次只驱逐一个
-        self.clock = max(self.clock, float(evicted_priority))
+        if evicted_priority > self.clock:
+            self.clock = evicted_priority
+
+        self._freq[slot] = freq
+        self._priority[slot] = prio
+        self._key2slot[key] = slot
+        self.store.add(key)
+        self._bucket_push(key, prio)
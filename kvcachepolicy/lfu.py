@@ -1,80 +1,113 @@
+from collections import OrderedDict
+from typing import Dict
+
 from kvstore import KVCacheStore
-from kvcachepolicy import KVCachePolicy
+from kvcachepolicy.base import KVCachePolicy
 
 
 class LFU(KVCachePolicy):
     """
     LFU 缓存淘汰策略
     基于访问频率进行缓存淘汰，优先淘汰访问频率最低的缓存项。
-    如果多个缓存项访问频率相同，则淘汰最早被访问的缓存项。（目前没有实现）
+    如果多个缓存项访问频率相同，则淘汰最早进入该频率的缓存项。
+    频率桶结构：freq -> OrderedDict[key]，命中与淘汰均为 O(1)。
     """
 
+    __slots__ = ("_resident", "buckets", "key_freq", "min_freq")
+
     def __init__(self, store: KVCacheStore):
         self.store = store
-        # self.queue = deque()  # FIFO 顺序，仅作为策略内部的淘汰依据
-        self.freq_map = {}  # 记录每个 key 的访问频率
+        self._resident = store.resident  # 与 store 共享的驻留集合，命中判断直接查集合
+        self.buckets: Dict[int, OrderedDict] = {}  # freq -> 该频率的 keys（按进入顺序）
+        self.key_freq: Dict[int, int] = {}  # 记录每个 key 的访问频率
         self.min_freq = 0  # 当前最小访问频率
-        self.min_set = set()  # 记录当前最小访问频率的 keys
 
     def access(self, key: int, request_prefix_hash_ids, request_type) -> bool:
-        # pass
-        if self.store.contains(key):
-            # 如果 hit，那么增加访问频率
-            self.freq_map[key] += 1
-            # 如果在 最小频率列表中，则需要对于该列表进行更新，否则不需要操作
-            if key in self.min_set:
-                # 如果该 key 是最后一个最小频率的 key，那么需要更新最小频率 和 最小频率集合
-                if (
-                    self.freq_map[key] > self.min_freq and len(self.min_set) == 1
-                ):  # 确实，如果最小的是1，那么增加到2后就不是最小了
-                    # self.min_freq = self.freq_map[key]
-                    # 这个时候，min_freq 需要判断是否需要更新，更新的情况是：如果访问的是最小的频率的 key，且其唯一，那么需要重新计算最小频率，同时需要更新最小频率的集合
-                    self.min_freq += 1
-                    self.renew_min_set()
-                else:
-                    # del self.min_set[key]
-                    self.min_set.remove(key)
-
+        if key in self._resident:
+            # 如果 hit，那么把 key 从 f 桶移到 f+1 桶
+            f = self.key_freq[key]
+            bucket = self.buckets[f]
+            del bucket[key]
+            if not bucket:
+                del self.buckets[f]
+                # 该 key 是最后一个最小频率的 key，最小频率恰好变为 f+1
+                if f == self.min_freq:
+                    self.min_freq = f + 1
+            self.buckets.setdefault(f + 1, OrderedDict())[key] = None
+            self.key_freq[key] = f + 1
             return True
 
-        if not self.store.contains(key):
-            # 如果 miss，检查是否需要淘汰。如果需要淘汰，那么淘汰访问频率最低的 key；如果不需要淘汰，那么直接添加，如果此时 freq_min 是0，那么需要更新为1
-            # 如果 freq_min 是1，那么说明当前的 min_set 中有key，直接添加即可；如果 freq_min 是大于1的，那么说明当前的 min_set 需要清空，且将该 key 添加入 min_set 之中。
-            # 无论是否淘汰，只要是 miss，都需要将 min_freq 设置为1，因为新加入的 key 访问频率为1
-            if self.store.size() >= self.store.capacity:
-                # 需要淘汰，此时 cache 满了，淘汰 min_set 中的一个 key 即可
-                # 先进行淘汰操作
-                evict_key = next(
-                    iter(self.min_set)
-                )  # 获取 min_set 中的一个 key 进行淘汰
-                self.store.delete(evict_key)
-                del self.freq_map[evict_key]
-                self.min_set.remove(evict_key)
+        # 如果 miss，cache 满时淘汰最小频率桶中最早进入的 key
+        if len(self._resident) >= self.store.capacity:
+            bucket = self.buckets[self.min_freq]
+            evict_key, _ = bucket.popitem(last=False)
+            if not bucket:
+                del self.buckets[self.min_freq]
+            self.store.delete(evict_key)
+            del self.key_freq[evict_key]
 
-            self.store.add(key)
-            self.freq_map[key] = 1
+        # 新加入的 key 访问频率为 1，因此最小频率一定变为 1
+        self.store.add(key)
+        self.key_freq[key] = 1
+        self.buckets.setdefault(1, OrderedDict())[key] = None
+        self.min_freq = 1
 
-            # 判断 min_freq 和 1 的关系
-            if self.min_freq > 1:
-                # 说明当前 min_set 中的 key 访问频率都大于 1，需要重置 min_set
-                self.min_set.clear()
-                self.min_set.add(key)
+        return False
 
-            self.min_freq = 1
-            self.min_set.add(key)
-            # self.renew_min_set() # 不能每一次都
+    def access_many(self, keys, request_prefix_hash_ids=None, request_type=None):
+        """access() 的批量版本：命中路径内联并绑定局部变量，未命中仍交给 access()。"""
+        resident = self._resident
+        buckets = self.buckets
+        key_freq = self.key_freq
+        access = self.access
+        results = []
+        append = results.append
+        for key in keys:
+            if key in resident:
+                f = key_freq[key]
+                bucket = buckets[f]
+                del bucket[key]
+                if not bucket:
+                    del buckets[f]
+                    if f == self.min_freq:
+                        self.min_freq = f + 1
+                nxt = buckets.get(f + 1)
+                if nxt is None:
+                    nxt = buckets[f + 1] = OrderedDict()
+                nxt[key] = None
+                key_freq[key] = f + 1
+                append(True)
+            else:
+                append(access(key, request_prefix_hash_ids, request_type))
+        return results
 
-        return False
+    def access_prefix(self, prefix_ids, request_type=None) -> int:
+        """access_many() 的计数版本：只统计命中次数，不构造结果列表。"""
+        resident = self._resident
+        buckets = self.buckets
+        key_freq = self.key_freq
+        access = self.access
+        hits = 0
+        for key in prefix_ids:
+            if key in resident:
+                f = key_freq[key]
+                bucket = buckets[f]
+                del bucket[key]
+                if not bucket:
+                    del buckets[f]
+                    if f == self.min_freq:
+                        self.min_freq = f + 1
+                nxt = buckets.get(f + 1)
+                if nxt is None:
+                    nxt = buckets[f + 1] = OrderedDict()
+                nxt[key] = None
+                key_freq[key] = f + 1
+                hits += 1
+            elif access(key, prefix_ids, request_type):
+                hits += 1
+        return hits
 
     def current_keys(self):
-        # return list(self.queue)
         return list(
-            self.freq_map.keys()
-        )  # 获得当前的 keys 列表，因为 freq_map 记录了所有在缓存中的 keys
-
-    def renew_min_set(self):
-        """更新当前最小频率的 key 集合"""
-        self.min_set = {k for k, v in self.freq_map.items() if v == self.min_freq}
-        # for k in self.freq_map:
-        #     if self.freq_map[k] == self.min_freq:
-        #         self.min_set[k] = True
+            self.key_freq.keys()
+        )  # 获得当前的 keys 列表，因为 key_freq 记录了所有在缓存中的 keys
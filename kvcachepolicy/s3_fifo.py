@@ -1,34 +1,137 @@
-from collections import deque, OrderedDict
+from array import array
+from collections import deque
 
 
-from kvcachepolicy import KVCachePolicy
+from kvcachepolicy.base import KVCachePolicy
 from kvstore import KVCacheStore
 
 
 class GhostFIFO:
     """
-    Ghost queue: FIFO order + O(1) membership via OrderedDict.
+    Ghost queue: FIFO order via a deque of insertion events + O(1) membership via a dict.
+
+    - remove() only drops the key from `live`; its deque entry goes stale and is discarded
+      lazily once it reaches the head (or when the deque is compacted).
+    - Entry j of the deque (counting every entry ever appended) carries stamp j + 1, so an
+      entry is live iff `live[key]` still equals its stamp; no per-entry tuples are needed.
     """
 
+    __slots__ = ("capacity", "live", "order", "N", "_head")
+
     def __init__(self, capacity: int):
         self.capacity = max(1, capacity)
-        self.od = OrderedDict()  # key -> virtual timestamp
-        self.N = 0
+        self.live = {}  # key -> stamp of its deque entry
+        self.order = deque()  # keys in insertion order (head=left), possibly stale
+        self.N = 0  # stamp of the newest entry
+        self._head = 1  # stamp of order[0]
 
     def contains(self, key: int) -> bool:
-        return key in self.od
+        return key in self.live
 
     def add(self, key: int):
+        live = self.live
+        # FIFO semantics: re-adding a ghost key does not refresh its position
+        if key in live:
+            return
         self.N += 1
-        # Insert newest; refresh if already exists
-        self.od[key] = self.N
-        self.od.move_to_end(key, last=True)
-        # Enforce capacity
-        while len(self.od) > self.capacity:
-            self.od.popitem(last=False)
+        live[key] = self.N
+        order = self.order
+        order.append(key)
+        # Enforce capacity (a single add can exceed it by at most one)
+        if len(live) > self.capacity:
+            popleft = order.popleft
+            head = self._head
+            while True:
+                k = popleft()
+                if live.get(k) == head:
+                    del live[k]
+                    head += 1
+                    break
+                head += 1
+            self._head = head
+        if len(order) > 2 * self.capacity:
+            self._compact()
 
     def remove(self, key: int):
-        self.od.pop(key, None)
+        self.live.pop(key, None)
+
+    def _compact(self):
+        """Drop stale entries and renumber the live ones 1..len(live)"""
+        live = self.live
+        keys = [k for i, k in enumerate(self.order, self._head) if live.get(k) == i]
+        for i, k in enumerate(keys, 1):
+            live[k] = i
+        self.order = deque(keys)
+        self.N = len(keys)
+        self._head = 1
+
+
+# Saturating freq increment, indexed by the current freq (0..3): min(freq + 1, 3)
+_SAT_INC = (1, 2, 3, 3)
+
+# Halve both 4-bit counters packed in a byte
+_HALVE_NIBBLES = bytes((b >> 1) & 0x77 for b in range(256))
+
+
+class CountMinSketch:
+    """
+    4-bit count-min sketch (depth 4) used as a TinyLFU-style admission filter.
+
+    - Two 4-bit counters per byte; counters saturate at 15.
+    - All 4 counters of a key live in one 64-byte block (a single cache line):
+      the hash picks the block, and row i picks a counter in its own 16-byte quarter of it.
+    - After `sample_size` increments every counter is halved, so stale popularity ages out.
+    """
+
+    __slots__ = ("_block_mask", "table", "sample_size", "additions")
+
+    def __init__(self, width: int, sample_size: int):
+        width = 1 << max(0, width - 1).bit_length()  # counters per row, rounded up to a power of 2
+        n_blocks = max(1, width * 4 // 128)  # 128 counters per 64-byte block
+        self._block_mask = n_blocks - 1
+        self.table = bytearray(n_blocks * 64)
+        self.sample_size = max(1, sample_size)
+        self.additions = 0
+
+    @staticmethod
+    def _hash(key: int) -> int:
+        h = (key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        return h ^ (h >> 29)
+
+    def increment(self, key: int):
+        table = self.table
+        h = self._hash(key)
+        base = (h & self._block_mask) << 6
+        h >>= 32
+        for row in (0, 16, 32, 48):
+            c = h & 31
+            h >>= 5
+            i = base + row + (c >> 1)
+            shift = (c & 1) << 2
+            if (table[i] >> shift) & 0xF < 15:
+                table[i] += 1 << shift
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.reset()
+
+    def estimate(self, key: int) -> int:
+        table = self.table
+        h = self._hash(key)
+        base = (h & self._block_mask) << 6
+        h >>= 32
+        est = 15
+        for row in (0, 16, 32, 48):
+            c = h & 31
+            h >>= 5
+            v = (table[base + row + (c >> 1)] >> ((c & 1) << 2)) & 0xF
+            if v < est:
+                est = v
+        return est
+
+    def reset(self):
+        """Halve every counter (aging)"""
+        self.table[:] = self.table.translate(_HALVE_NIBBLES)
+        self.additions //= 2
 
 
 class S3FIFO(KVCachePolicy):
@@ -36,26 +139,87 @@ class S3FIFO(KVCachePolicy):
     An implementation of the S3FIFO cache replacement policy.
 
     Notes:
-    - To enable fast "in S / in M / in G" checks, corresponding sets are maintained.
-    - G is a FIFO + set with a capacity limit set to the total cache size (empirical value for stability); this can be adjusted as needed.
+    - Each resident key owns a compact slot id; _slot (key -> slot) holds exactly the resident keys,
+      so it doubles as the O(1) "in S or M" check. S and M hold slot ids, and freq lives in a bytearray
+      indexed by slot, so the eviction loops never hash a key to read or update freq.
+    - S and M are ring buffers over preallocated array('q') of store.capacity entries each
+      (either queue may briefly hold every resident key). *_head is the index of the head element,
+      the tail is at (head + count - 1) % capacity.
+    - G is a ring buffer + key -> slot dict holding at most ghost_capacity live keys, set to the total
+      cache size (empirical value for stability); this can be adjusted as needed.
+      Removing a key from G only drops its slot mapping; the stale slot is skipped when it reaches the tail.
+      The ring has room for 2 * ghost_capacity slots and is compacted when stale slots fill it.
+    - admission_filter=True adds a TinyLFU count-min sketch in front of S: a missed key whose estimated
+      access count is below 2 is only recorded in G, so its next access goes straight to M.
     """
 
-    def __init__(self, store: KVCacheStore, sm_ratio: float = 0.1):
+    __slots__ = (
+        "capacity",
+        "S_buf",
+        "S_head",
+        "S_count",
+        "M_buf",
+        "M_head",
+        "M_count",
+        "ghost_capacity",
+        "_g_buf",
+        "_g_head",
+        "_g_tail",
+        "_g_count",
+        "_g_pos",
+        "_slot",
+        "_keys",
+        "_free_slots",
+        "_freq",
+        "s_capacity",
+        "m_capacity",
+        "_sketch",
+        "_resident",
+    )
+
+    def __init__(
+        self, store: KVCacheStore, sm_ratio: float = 0.1, admission_filter: bool = False
+    ):
         self.store = store
+        # Capacities are fixed at construction; keep them as plain attributes so the
+        # hot paths do not re-read store.capacity through the store object
+        self.capacity = store.capacity
+        # Shared with the store: size checks read it directly, writes go through the store
+        self._resident = store.resident
 
-        # Small/Main queues and sets (for O(1) membership checks)
-        self.S = deque()  # left is the head, right is the tail
-        self.M = deque()
+        # Small/Main queues of slot ids (ring buffers)
+        self.S_buf = array("q", [0]) * store.capacity
+        self.S_head = 0
+        self.S_count = 0
+        self.M_buf = array("q", [0]) * store.capacity
+        self.M_head = 0
+        self.M_count = 0
 
-        # Ghost queue and set
-        self.G = GhostFIFO(capacity=store.capacity)
+        # Ghost queue: ring buffer of keys + key -> slot index (O(1) amortized add/contains/remove)
+        self.ghost_capacity = max(1, store.capacity)
+        self._g_buf = array("q", [0]) * (2 * self.ghost_capacity)
+        self._g_head = 0  # next slot to write
+        self._g_tail = 0  # oldest occupied slot
+        self._g_count = 0  # occupied slots, including stale (removed) ones
+        self._g_pos = {}  # key -> slot; its size is the number of live ghost keys
 
-        # Hit frequency (maintained only for resident keys; ghost keys do not have freq)
-        self.freq = {}  # key -> int (0..3)
+        # Slot ids for resident keys (ghost keys do not have a slot)
+        self._slot = {}  # key -> slot
+        self._keys = array("q", [0]) * store.capacity  # slot -> key
+        self._free_slots = list(range(store.capacity - 1, -1, -1))
+        # Hit frequency per slot (0..3)
+        self._freq = bytearray(store.capacity)
 
         self.s_capacity = int(sm_ratio * store.capacity)
         self.m_capacity = store.capacity - self.s_capacity
 
+        # Optional TinyLFU admission filter
+        self._sketch = (
+            CountMinSketch(width=store.capacity * 8, sample_size=store.capacity * 10)
+            if admission_filter
+            else None
+        )
+
     def access(self, key: int, request_prefix_hash_ids=None, request_type=None) -> bool:
         """
         Corresponds to READ(x):
@@ -63,32 +227,88 @@ class S3FIFO(KVCachePolicy):
         - On miss: INSERT(x), then freq <- 0
         Returns True/False indicating hit/miss.
         """
-        if self.store.contains(key):
+        sketch = self._sketch
+        if sketch is not None:
+            sketch.increment(key)
+
+        slot = self._slot.get(key)
+        if slot is not None:
             # Cache hit
-            self.freq[key] = min(self.freq.get(key, 0) + 1, 3)
+            freq = self._freq
+            freq[slot] = _SAT_INC[freq[slot]]
             return True
 
-        # Cache miss -> INSERT
+        # Cache miss -> INSERT (freq <- 0 is set when the key enters S or M)
         self.insert(key)
-        self.freq[key] = 0
         return False
 
+    def access_many(self, keys, request_prefix_hash_ids=None, request_type=None):
+        """access() for a batch of keys with the hit-path state bound once"""
+        if self._sketch is not None:
+            return KVCachePolicy.access_many(
+                self, keys, request_prefix_hash_ids, request_type
+            )
+
+        slot_get = self._slot.get
+        freq = self._freq
+        insert = self.insert
+        results = []
+        append = results.append
+        for key in keys:
+            slot = slot_get(key)
+            if slot is not None:
+                freq[slot] = _SAT_INC[freq[slot]]
+                append(True)
+            else:
+                insert(key)
+                append(False)
+        return results
+
+    def access_prefix(self, prefix_ids, request_type=None) -> int:
+        """access_many() over one request prefix, counting hits instead of collecting flags"""
+        if self._sketch is not None:
+            return KVCachePolicy.access_prefix(self, prefix_ids, request_type)
+
+        slot_get = self._slot.get
+        freq = self._freq
+        insert = self.insert
+        hits = 0
+        for key in prefix_ids:
+            slot = slot_get(key)
+            if slot is not None:
+                freq[slot] = _SAT_INC[freq[slot]]
+                hits += 1
+            else:
+                insert(key)
+        return hits
+
     def insert(self, key: int):
-        while (
-            self.store.size() >= self.store.capacity
-        ):  # Ensure space (resident cache is not full)
-            self.evict()
+        sketch = self._sketch
+        g_pos = self._g_pos
+        if sketch is not None and key not in g_pos and sketch.estimate(key) < 2:
+            # Rejected by the admission filter: remember it in G only
+            self._ghost_add(key)
+            return
 
-        if self.G.contains(key):
+        # Ensure space (resident cache is not full); same dispatch as evict(), inlined
+        s_capacity = self.s_capacity
+        resident = self._resident
+        while len(resident) >= self.capacity:
+            if self.S_count >= s_capacity:
+                self._evictS()
+            else:
+                self._evictM()
+
+        if key in g_pos:
             self._insert_head_M(key)
-            self.G.remove(key)
+            self._ghost_remove(key)
             self._rebalance_M_if_over()
         else:
             self._insert_head_S(key)
             # Optional: if S grows too fast, subsequent EVICT will prioritize cleaning S
 
     def evict(self):
-        if len(self.S) >= self.s_capacity:
+        if self.S_count >= self.s_capacity:
             self._evictS()
         else:
             self._evictM()
@@ -100,62 +320,193 @@ class S3FIFO(KVCachePolicy):
           - Else: evict t to G and remove t from S (a real eviction occurs)
           - Repeat until a real eviction occurs or S is empty
         """
-        evicted = False
-        while not evicted and len(self.S) > 0:
-            t = self.S[-1]  # tail of S
-            t_freq = self.freq.get(t, 0)
-
-            # Remove t from S (both moving and evicting require removal from S first)
-            self.S.pop()
+        cap = self.capacity
+        S_buf = self.S_buf
+        M_buf = self.M_buf
+        freq = self._freq
+        s_head = self.S_head
+        s_count = self.S_count  # rebalancing M never touches S, so S state stays in locals
+        while s_count > 0:
+            # Remove t from the tail of S (both moving and evicting require removal from S first)
+            s_count -= 1
+            t = S_buf[(s_head + s_count) % cap]  # slot id
 
-            if t_freq > 1:  # Promote t to M
-                self.M.appendleft(t)
+            if freq[t] > 1:  # Promote t to M
+                m_head = self.M_head = (self.M_head - 1) % cap
+                M_buf[m_head] = t
+                self.M_count += 1
                 self._rebalance_M_if_over()
             else:  # Evict t to G (real eviction)
-                self.G.add(t)
-                self.store.delete(t)
-                self.freq.pop(t, None)
-                evicted = True
+                key = self._keys[t]
+                self._ghost_add(key)
+                self.store.delete(key)
+                del self._slot[key]
+                self._free_slots.append(t)
+                break
+        self.S_count = s_count
 
     def _evictM(self):
+        """Evict one key from M (see _evict_M_batch)"""
+        self._evict_M_batch(1)
+
+    def _evict_M_batch(self, n_to_evict: int):
         """
-        Evict from the tail of M
+        Evict n_to_evict keys from the tail of M in a single pass
           - If t.freq > 0: rotate t to the head of M and decrement t.freq (no real eviction occurs)
-          - Else: remove t from M
-          - Repeat until a real eviction occurs or M is empty
+          - Else: remove t from M and send it to G (a real eviction)
+          - Repeat until n_to_evict real evictions occur or M is empty
+        Victims are sent to G and removed from the store in one batch each after the pass.
         """
-        evicted = False
-        while not evicted and len(self.M) > 0:
-            t = self.M[-1]  # tail of M
-            t_freq = self.freq.get(t, 0)
+        cap = self.capacity
+        buf = self.M_buf
+        freq = self._freq
+        m_head = self.M_head
+        m_count = self.M_count
+        victims = []
+        while len(victims) < n_to_evict and m_count > 0:
+            t = buf[(m_head + m_count - 1) % cap]  # tail of M (slot id)
+            t_freq = freq[t]
 
             if t_freq > 0:
                 # Rotate t to the head of M and decrement its frequency
-                self.M.pop()
-                self.M.appendleft(t)
-                self.freq[t] = t_freq - 1
+                m_head = (m_head - 1) % cap
+                buf[m_head] = t
+                freq[t] = t_freq - 1
             else:
-                self.M.pop()
-                self.store.delete(t)
-                self.G.add(t)
-                self.freq.pop(t, None)
-                evicted = True
+                m_count -= 1
+                key = self._keys[t]
+                del self._slot[key]
+                self._free_slots.append(t)
+                victims.append(key)
+        self.M_head = m_head
+        self.M_count = m_count
+        if victims:
+            self._ghost_add_many(victims)
+            self.store.delete_many(victims)
+
+    def _ghost_add(self, key: int):
+        """Record key at the head of G, dropping the oldest live key when G is full"""
+        g_pos = self._g_pos
+        if len(g_pos) >= self.ghost_capacity:
+            self._ghost_drop_oldest()
+        buf = self._g_buf
+        if self._g_count == len(buf):
+            self._ghost_compact()
+        head = self._g_head
+        buf[head] = key
+        g_pos[key] = head
+        self._g_head = (head + 1) % len(buf)
+        self._g_count += 1
+
+    def _ghost_add_many(self, keys):
+        """_ghost_add for a batch of keys, in order, with the ring state kept in locals"""
+        buf = self._g_buf
+        size = len(buf)
+        g_pos = self._g_pos
+        cap = self.ghost_capacity
+        head = self._g_head
+        tail = self._g_tail
+        count = self._g_count
+        for key in keys:
+            if len(g_pos) >= cap:
+                # Drop the oldest live key, skipping stale slots on the way
+                while True:
+                    old = buf[tail]
+                    live = g_pos.get(old) == tail
+                    tail = (tail + 1) % size
+                    count -= 1
+                    if live:
+                        del g_pos[old]
+                        break
+            if count == size:
+                self._g_head, self._g_tail, self._g_count = head, tail, count
+                self._ghost_compact()
+                head, tail, count = self._g_head, self._g_tail, self._g_count
+            buf[head] = key
+            g_pos[key] = head
+            head = (head + 1) % size
+            count += 1
+        self._g_head = head
+        self._g_tail = tail
+        self._g_count = count
+
+    def _ghost_drop_oldest(self):
+        """Advance the tail of G past stale slots and forget the first live key found there"""
+        buf = self._g_buf
+        size = len(buf)
+        g_pos = self._g_pos
+        tail = self._g_tail
+        count = self._g_count
+        while True:
+            old = buf[tail]
+            live = g_pos.get(old) == tail
+            tail = (tail + 1) % size
+            count -= 1
+            if live:
+                del g_pos[old]
+                break
+        self._g_tail = tail
+        self._g_count = count
+
+    def _ghost_compact(self):
+        """Move the live keys of G, oldest first, to the start of the ring and drop the stale slots"""
+        buf = self._g_buf
+        size = len(buf)
+        g_pos = self._g_pos
+        tail = self._g_tail
+        keys = []
+        for i in range(self._g_count):
+            idx = (tail + i) % size
+            k = buf[idx]
+            if g_pos.get(k) == idx:
+                keys.append(k)
+        for i, k in enumerate(keys):
+            buf[i] = k
+            g_pos[k] = i
+        n = len(keys)
+        self._g_head = n % size
+        self._g_tail = 0
+        self._g_count = n
+
+    def _ghost_contains(self, key: int) -> bool:
+        return key in self._g_pos
+
+    def _ghost_remove(self, key: int):
+        """Forget key; its slot stays in the ring as a tombstone until the tail passes it or G is compacted"""
+        self._g_pos.pop(key, None)
 
     def _insert_head_S(self, key: int):
         """Insert key at the head of S"""
-        self.S.appendleft(key)
+        self.S_head = (self.S_head - 1) % self.capacity
+        self.S_buf[self.S_head] = self._alloc_slot(key)
+        self.S_count += 1
         self.store.add(key)
 
     def _insert_head_M(self, key: int):
         """Insert key at the head of M"""
-        self.M.appendleft(key)
+        self.M_head = (self.M_head - 1) % self.capacity
+        self.M_buf[self.M_head] = self._alloc_slot(key)
+        self.M_count += 1
         self.store.add(key)
 
+    def _alloc_slot(self, key: int) -> int:
+        """Give key a free slot with freq 0"""
+        slot = self._free_slots.pop()
+        self._slot[key] = slot
+        self._keys[slot] = key
+        self._freq[slot] = 0
+        return slot
+
     def _rebalance_M_if_over(self):
         """If M exceeds its target size (90%), proactively evict from M to rebalance"""
-        while len(self.M) > self.m_capacity:
-            self._evictM()
+        over = self.M_count - self.m_capacity
+        if over > 0:
+            self._evict_M_batch(over)
 
     def current_keys(self):
         """Return the current resident keys (S head->tail, M head->tail) for debugging/inspection"""
-        return list(self.S), list(self.M)
+        cap = self.capacity
+        keys = self._keys
+        s_keys = [keys[self.S_buf[(self.S_head + i) % cap]] for i in range(self.S_count)]
+        m_keys = [keys[self.M_buf[(self.M_head + i) % cap]] for i in range(self.M_count)]
+        return s_keys, m_keys
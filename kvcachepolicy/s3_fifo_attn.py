@@ -2,9 +2,24 @@ from collections import deque, OrderedDict
 from typing import Dict, List, Optional
 
 
-from kvcachepolicy import KVCachePolicy, GhostFIFO
+from kvcachepolicy.base import KVCachePolicy
+from kvcachepolicy.s3_fifo import _SAT_INC, GhostFIFO
 from kvstore import KVCacheStore
 
+try:
+    import numpy as np
+except ImportError:  # optional: only used to vectorize long requests
+    np = None
+
+if np is not None:
+    from kvcachepolicy._runs_numba import HAS_NUMBA, compute_offsets
+else:
+    HAS_NUMBA = False
+
+# Below these request lengths the pure-Python pass beats the array conversion overhead
+_NUMBA_MIN_LEN = 128
+_NUMPY_MIN_LEN = 1024
+
 
 class S3FIFO_Attn(KVCachePolicy):
     """
@@ -17,10 +32,25 @@ class S3FIFO_Attn(KVCachePolicy):
     - Update policy similar to freq:
         * on hit: offset <- min(offset+1, 3)
         * on M tail rotation: if offset>0, rotate to head and offset <- offset-1; else real eviction
+    - offset holds exactly the resident keys, so it is also the policy's own O(1) residency check.
     """
 
+    __slots__ = (
+        "_resident",
+        "S",
+        "M",
+        "G",
+        "offset",
+        "s_capacity",
+        "m_capacity",
+        "_offset_cache_req",
+        "_offset_cache_map",
+    )
+
     def __init__(self, store: KVCacheStore, sm_ratio: float = 0.05):
         self.store = store
+        # Shared with the store: size checks read it directly, writes go through the store
+        self._resident = store.resident
 
         # Small/Main queues and sets (for O(1) membership checks)
         self.S = deque()  # left is the head, right is the tail
@@ -28,21 +58,23 @@ class S3FIFO_Attn(KVCachePolicy):
 
         self.G = GhostFIFO(capacity=store.capacity)
 
-        # offset per resident key (0..3)
+        # offset per resident key (0..3); membership doubles as the residency check
         self.offset: Dict[int, int] = {}
 
         self.s_capacity = int(sm_ratio * store.capacity)
         self.m_capacity = store.capacity - self.s_capacity
 
         # per-request offset cache
-        self._offset_cache_req_id: Optional[int] = None  # id(request_prefix_hash_ids)
+        # holds the list itself: an id() alone can be reused once the list is freed
+        self._offset_cache_req: Optional[List[int]] = None
         self._offset_cache_map: Dict[int, int] = {}
 
     def access(
         self, key: int, request_prefix_hash_ids: List[int] = None, request_type=None
     ) -> bool:
-        if self.store.contains(key):
-            self.offset[key] = min(self.offset.get(key, 0) + 1, 3)
+        off = self.offset.get(key)
+        if off is not None:
+            self.offset[key] = _SAT_INC[off]
             return True
 
         init_offset = self._get_init_offset(key, request_prefix_hash_ids)
@@ -50,14 +82,53 @@ class S3FIFO_Attn(KVCachePolicy):
         self.insert(key)
         return False
 
+    def access_many(
+        self, keys: List[int], request_prefix_hash_ids: List[int] = None, request_type=None
+    ) -> List[bool]:
+        """access() for a batch of keys: the request's offset map is looked up once"""
+        offset = self.offset
+        init_offsets = self._request_offsets(request_prefix_hash_ids)
+        insert = self.insert
+        results = []
+        append = results.append
+        for key in keys:
+            off = offset.get(key)
+            if off is not None:
+                offset[key] = _SAT_INC[off]
+                append(True)
+            else:
+                offset[key] = init_offsets.get(key, 0)
+                insert(key)
+                append(False)
+        return results
+
+    def access_prefix(self, prefix_ids: List[int], request_type=None) -> int:
+        """access_many() over one request prefix, counting hits instead of collecting flags"""
+        offset = self.offset
+        init_offsets = self._request_offsets(prefix_ids)
+        insert = self.insert
+        hits = 0
+        for key in prefix_ids:
+            off = offset.get(key)
+            if off is not None:
+                offset[key] = _SAT_INC[off]
+                hits += 1
+            else:
+                offset[key] = init_offsets.get(key, 0)
+                insert(key)
+        return hits
+
     def insert(self, key: int):
         # Ensure space
-        while self.store.size() >= self.store.capacity:
+        resident = self._resident
+        capacity = self.store.capacity
+        while len(resident) >= capacity:
             self.evict()
 
-        if self.G.contains(key):
+        G = self.G
+        if G.contains(key):
             self._insert_head_M(key)
-            self.G.remove(key)
+            G.remove(key)
             self._rebalance_M_if_over()
         else:
             self._insert_head_S(key)
@@ -75,20 +146,21 @@ class S3FIFO_Attn(KVCachePolicy):
           - Else: real eviction -> move to Ghost and delete from store
           - Repeat until a real eviction occurs or S is empty
         """
+        S = self.S
+        offset = self.offset
         evicted = False
-        while not evicted and len(self.S) > 0:
-            t = self.S[-1]
-            t_off = self.offset.get(t, 0)
-
-            self.S.pop()
+        while not evicted and len(S) > 0:
+            t = S.pop()
+            # Fetch-and-remove in one lookup; a promoted key gets its offset back
+            t_off = offset.pop(t, 0)
 
             if t_off > 0:
+                offset[t] = t_off
                 self.M.appendleft(t)
                 self._rebalance_M_if_over()
             else:  # Evict t to G (real eviction)
                 self.G.add(t)
                 self.store.delete(t)
-                self.offset.pop(t, None)
                 evicted = True
 
     def _evictM(self):
@@ -97,20 +169,21 @@ class S3FIFO_Attn(KVCachePolicy):
           - If t.offset > 0: rotate to head and decrement offset
           - Else: real eviction -> move to Ghost and delete from store
         """
+        M = self.M
+        offset = self.offset
         evicted = False
-        while not evicted and len(self.M) > 0:
-            t = self.M[-1]
-            t_off = self.offset.get(t, 0)
+        while not evicted and len(M) > 0:
+            # Pop the tail once; survivors go straight back to the head (rotate by 1)
+            t = M.pop()
+            # Fetch-and-remove in one lookup; a survivor is re-inserted with offset - 1
+            t_off = offset.pop(t, 0)
 
             if t_off > 0:
-                self.M.pop()
-                self.M.appendleft(t)
-                self.offset[t] = t_off - 1
+                M.appendleft(t)
+                offset[t] = t_off - 1
             else:
-                self.M.pop()
                 self.store.delete(t)
                 self.G.add(t)
-                self.offset.pop(t, None)
                 evicted = True
 
     def _insert_head_S(self, key: int):
@@ -122,49 +195,76 @@ class S3FIFO_Attn(KVCachePolicy):
         self.store.add(key)
 
     def _rebalance_M_if_over(self):
-        while len(self.M) > self.m_capacity:
-            self._evictM()
+        """
+        Evict from M until it is back within m_capacity, in a single tail scan:
+        same rotations and evictions as repeated _evictM() calls, without a frame per eviction.
+        """
+        M = self.M
+        over = len(M) - self.m_capacity
+        if over <= 0:
+            return
+        offset = self.offset
+        while over > 0:
+            t = M.pop()
+            t_off = offset.pop(t, 0)
+            if t_off > 0:
+                M.appendleft(t)
+                offset[t] = t_off - 1
+            else:
+                self.store.delete(t)
+                self.G.add(t)
+                over -= 1
 
     def _get_init_offset(
         self, key: int, request_prefix_hash_ids: Optional[List[int]]
     ) -> int:
+        return self._request_offsets(request_prefix_hash_ids).get(key, 0)
+
+    def _request_offsets(self, request_prefix_hash_ids: Optional[List[int]]) -> Dict[int, int]:
         if not request_prefix_hash_ids:
-            return 0
-        req_id = id(request_prefix_hash_ids)
-        if self._offset_cache_req_id != req_id:
+            return {}
+        if self._offset_cache_req is not request_prefix_hash_ids:
             # compute once per new request (list object identity)
             self._offset_cache_map = self._compute_request_offsets(
                 request_prefix_hash_ids
             )
-            self._offset_cache_req_id = req_id
-        return min(self._offset_cache_map.get(key, 0), 3)
+            self._offset_cache_req = request_prefix_hash_ids
+        return self._offset_cache_map
 
     @staticmethod
     def _compute_request_offsets(seq: List[int]) -> Dict[int, int]:
         """
         Split seq into contiguous runs (x[i] == x[i-1]+1).
-        The last run gets offset 0, the previous run gets 1, etc.
+        The last run gets offset 0, the previous run gets 1, etc. (capped at 3).
         Example:
           seq = [1,15,16,...,27,3869,3870]
           runs = [[1],[15..27],[3869,3870]]
           offsets: {1:2, 15..27:1, 3869..3870:0}
+        A key that occurs more than once takes the offset of its last occurrence.
         """
         if not seq:
             return {}
-        runs: List[List[int]] = []
-        cur = [seq[0]]
-        for i in range(1, len(seq)):
-            if seq[i] == seq[i - 1] + 1:
-                cur.append(seq[i])
-            else:
-                runs.append(cur)
-                cur = [seq[i]]
-        runs.append(cur)
+        if HAS_NUMBA and len(seq) >= _NUMBA_MIN_LEN:
+            arr = np.fromiter(seq, dtype=np.int64, count=len(seq))
+            return dict(zip(seq, compute_offsets(arr).tolist()))
+        if np is not None and len(seq) >= _NUMPY_MIN_LEN:
+            arr = np.asarray(seq, dtype=np.int64)
+            breaks = np.empty(arr.size, dtype=np.int64)
+            breaks[0] = 0
+            np.not_equal(np.diff(arr), 1, out=breaks[1:])
+            run_id = np.cumsum(breaks)
+            offsets = np.minimum(run_id[-1] - run_id, 3)
+            return dict(zip(seq, offsets.tolist()))
 
+        # Walk from the tail, counting run boundaries; the first sighting is the last occurrence
         out: Dict[int, int] = {}
-        for idx, run in enumerate(runs):
-            off = len(runs) - 1 - idx  # last run -> 0
-            for x in run:
+        off = 0
+        nxt = seq[-1] + 1
+        for x in reversed(seq):
+            if x + 1 != nxt and off < 3:
+                off += 1
+            nxt = x
+            if x not in out:
                 out[x] = off
         return out
 
@@ -0,0 +1,218 @@
+"""
+Array-only S3FIFO replay kernel, compiled with Numba when it is available.
+
+`S3FIFO.access` pays Python interpreter overhead (attribute loads, method dispatch, int boxing)
+on every single key. For offline evaluation we know the whole trace up front, so this module
+replays it in one call:
+
+- keys are remapped to dense ids 0..U-1 once (np.unique), so residency and ghost lookups are
+  plain array indexing instead of hash tables;
+- S and M are int64 ring buffers, freq is a uint8 array indexed by slot;
+- G is a doubly linked list over dense ids (g_prev / g_next), so removing a key re-admitted
+  from G is O(1) and G always holds up to `capacity` live keys, like the Python ghost;
+- the control flow mirrors `kvcachepolicy.s3_fifo.S3FIFO` (admission_filter=False) step by step,
+  so hit counts are identical to the pure-Python policy.
+
+This module is not imported by `kvcachepolicy/__init__.py`: it needs numpy, and is only worth
+using when numba is installed (HAS_NUMBA). Without numba the kernel still runs, but slowly.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+
+    HAS_NUMBA = True
+except ImportError:  # graceful degradation: plain Python functions
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+
+# Indexes into the scalar state vector `st`
+# (_G_NEW / _G_OLD: newest / oldest key in G, -1 when G is empty; _G_CNT: keys in G)
+_S_HEAD, _S_CNT, _M_HEAD, _M_CNT, _G_NEW, _G_OLD, _G_CNT, _SIZE, _NFREE = range(9)
+# g_prev value of a key that is not in G
+_NOT_IN_G = -2
+
+
+@njit(cache=True)
+def _ghost_remove(k, g_prev, g_next, st):
+    p = g_prev[k]
+    n = g_next[k]
+    if p >= 0:
+        g_next[p] = n
+    else:
+        st[_G_OLD] = n
+    if n >= 0:
+        g_prev[n] = p
+    else:
+        st[_G_NEW] = p
+    g_prev[k] = _NOT_IN_G
+    st[_G_CNT] -= 1
+
+
+@njit(cache=True)
+def _ghost_add(k, g_prev, g_next, st, cap):
+    if st[_G_CNT] == cap:
+        _ghost_remove(st[_G_OLD], g_prev, g_next, st)
+    newest = st[_G_NEW]
+    g_prev[k] = newest
+    g_next[k] = -1
+    if newest >= 0:
+        g_next[newest] = k
+    else:
+        st[_G_OLD] = k
+    st[_G_NEW] = k
+    st[_G_CNT] += 1
+
+
+@njit(cache=True)
+def _release(t, slot_key, slot_of, free, g_prev, g_next, st, cap):
+    """Real eviction of slot t: send its key to G and free the slot"""
+    k = slot_key[t]
+    _ghost_add(k, g_prev, g_next, st, cap)
+    slot_of[k] = -1
+    free[st[_NFREE]] = t
+    st[_NFREE] += 1
+    st[_SIZE] -= 1
+
+
+@njit(cache=True)
+def _evict_m(M_buf, freq, slot_key, slot_of, free, g_prev, g_next, st, cap):
+    while st[_M_CNT] > 0:
+        tail = (st[_M_HEAD] + st[_M_CNT] - 1) % cap
+        t = M_buf[tail]
+        f = freq[t]
+        st[_M_CNT] -= 1
+        if f > 0:
+            # Rotate t to the head of M and decrement its frequency
+            head = (st[_M_HEAD] - 1) % cap
+            M_buf[head] = t
+            st[_M_HEAD] = head
+            st[_M_CNT] += 1
+            freq[t] = f - 1
+        else:
+            _release(t, slot_key, slot_of, free, g_prev, g_next, st, cap)
+            return
+
+
+@njit(cache=True)
+def _rebalance_m(M_buf, freq, slot_key, slot_of, free, g_prev, g_next, st, cap, m_cap):
+    while st[_M_CNT] > m_cap:
+        _evict_m(M_buf, freq, slot_key, slot_of, free, g_prev, g_next, st, cap)
+
+
+@njit(cache=True)
+def _evict_s(S_buf, M_buf, freq, slot_key, slot_of, free, g_prev, g_next, st, cap, m_cap):
+    while st[_S_CNT] > 0:
+        tail = (st[_S_HEAD] + st[_S_CNT] - 1) % cap
+        t = S_buf[tail]
+        st[_S_CNT] -= 1
+        if freq[t] > 1:  # Promote t to M
+            head = (st[_M_HEAD] - 1) % cap
+            M_buf[head] = t
+            st[_M_HEAD] = head
+            st[_M_CNT] += 1
+            _rebalance_m(M_buf, freq, slot_key, slot_of, free, g_prev, g_next, st, cap, m_cap)
+        else:
+            _release(t, slot_key, slot_of, free, g_prev, g_next, st, cap)
+            return
+
+
+@njit(cache=True)
+def s3fifo_replay_dense(ids, n_ids, capacity, s_capacity):
+    """
+    Replay dense key ids (0..n_ids-1) through S3FIFO and return the number of hits.
+    """
+    cap = capacity
+    m_cap = capacity - s_capacity
+
+    S_buf = np.zeros(cap, dtype=np.int64)
+    M_buf = np.zeros(cap, dtype=np.int64)
+    g_prev = np.full(n_ids, _NOT_IN_G, dtype=np.int64)  # key -> next older key in G
+    g_next = np.full(n_ids, -1, dtype=np.int64)  # key -> next newer key in G
+    slot_of = np.full(n_ids, -1, dtype=np.int64)  # key -> resident slot
+    slot_key = np.zeros(cap, dtype=np.int64)  # slot -> key
+    freq = np.zeros(cap, dtype=np.uint8)
+    free = np.arange(cap - 1, -1, -1).astype(np.int64)
+    st = np.zeros(9, dtype=np.int64)
+    st[_G_NEW] = -1
+    st[_G_OLD] = -1
+    st[_NFREE] = cap
+
+    hits = 0
+    for i in range(ids.shape[0]):
+        k = ids[i]
+        slot = slot_of[k]
+        if slot >= 0:
+            if freq[slot] < 3:
+                freq[slot] += 1
+            hits += 1
+            continue
+
+        # Miss -> INSERT: ensure space
+        while st[_SIZE] >= cap:
+            if st[_S_CNT] >= s_capacity:
+                _evict_s(S_buf, M_buf, freq, slot_key, slot_of, free, g_prev, g_next, st, cap, m_cap)
+            else:
+                _evict_m(M_buf, freq, slot_key, slot_of, free, g_prev, g_next, st, cap)
+
+        st[_NFREE] -= 1
+        slot = free[st[_NFREE]]
+        slot_of[k] = slot
+        slot_key[slot] = k
+        freq[slot] = 0
+        st[_SIZE] += 1
+
+        if g_prev[k] != _NOT_IN_G:
+            head = (st[_M_HEAD] - 1) % cap
+            M_buf[head] = slot
+            st[_M_HEAD] = head
+            st[_M_CNT] += 1
+            _ghost_remove(k, g_prev, g_next, st)
+            _rebalance_m(M_buf, freq, slot_key, slot_of, free, g_prev, g_next, st, cap, m_cap)
+        else:
+            head = (st[_S_HEAD] - 1) % cap
+            S_buf[head] = slot
+            st[_S_HEAD] = head
+            st[_S_CNT] += 1
+    return hits
+
+
+def densify(keys):
+    """
+    Remap a flat sequence of prefix hash ids to dense ids 0..U-1.
+    Returns (dense int64 array, U); compute it once and replay it at several capacities.
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    if keys.size == 0:
+        return np.zeros(0, dtype=np.int64), 0
+    uniq, dense = np.unique(keys, return_inverse=True)
+    return dense.astype(np.int64, copy=False), int(uniq.size)
+
+
+def s3fifo_replay_ids(dense, n_ids: int, capacity: int, sm_ratio: float = 0.1) -> int:
+    """
+    Replay the output of `densify` through S3FIFO and return the number of hits.
+    Same capacities as `S3FIFO(KVCacheStore(capacity), sm_ratio)`.
+    """
+    if capacity <= 0:
+        raise ValueError("capacity must be positive")
+    if dense.size == 0:
+        return 0
+    return int(s3fifo_replay_dense(dense, n_ids, capacity, int(sm_ratio * capacity)))
+
+
+def s3fifo_replay(keys, capacity: int, sm_ratio: float = 0.1) -> int:
+    """
+    Replay a flat sequence of prefix hash ids through S3FIFO and return the number of hits.
+    Same capacities as `S3FIFO(KVCacheStore(capacity), sm_ratio)`.
+    """
+    if capacity <= 0:
+        raise ValueError("capacity must be positive")
+    dense, n_ids = densify(keys)
+    return s3fifo_replay_ids(dense, n_ids, capacity, sm_ratio)
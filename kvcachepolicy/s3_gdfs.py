@@ -1,10 +1,13 @@
-from collections import deque
-from typing import Dict, Any, List, Optional, Tuple
-import heapq
+from collections import deque, OrderedDict
+from typing import Dict, List, Optional, Tuple
 
-from kvcachepolicy import KVCachePolicy, GhostFIFO
+from kvcachepolicy.base import KVCachePolicy
+from kvcachepolicy.s3_fifo import GhostFIFO
 from kvstore import KVCacheStore
 
+# Priority buckets per unit of priority: bucket id = int(priority * _BUCKETS_PER_UNIT)
+_BUCKETS_PER_UNIT = 256
+
 
 class S3FIFO_Prio(KVCachePolicy):
     """
@@ -24,24 +27,64 @@ class S3FIFO_Prio(KVCachePolicy):
       - Eviction updates Clock = max(Clock, victim_priority).
     """
 
+    __slots__ = (
+        "_resident",
+        "S",
+        "M",
+        "ghost",
+        "clock",
+        "_meta",
+        "_buckets",
+        "_min_bucket",
+        "s_capacity",
+        "m_capacity",
+        "pos_alpha",
+        "_pos_cache_req",
+        "_pos_cache_map",
+        "_loc",
+        "_stale_S",
+        "_stale_M",
+        "_s_len",
+        "_m_len",
+    )
+
     def __init__(
         self, store: KVCacheStore, pos_alpha: float = 1.0, sm_ratio: float = 0.1
     ):
         self.store = store
+        # Shared with the store: hit/size checks read it directly, writes go through the store
+        self._resident = store.resident
         self.S = deque()  # small FIFO (head=left, tail=right)
         self.M = deque()  # main FIFO
         self.ghost = GhostFIFO(capacity=store.capacity)
 
-        # Priority metadata and heap
+        # Priority metadata and bucket queue
         self.clock: float = 0.0
-        self._heap: list[tuple[float, int, int]] = []  # (priority, version, key)
-        self._meta: Dict[int, Dict[str, Any]] = {}  # key -> {priority, version}
+        self._meta: Dict[int, float] = {}  # key -> priority
+        # bucket id -> OrderedDict[key, None] (FIFO within a bucket). Priorities are
+        # Clock + a bounded bonus, so resident keys span few buckets and the min pointer
+        # only has to advance past a handful of empty ids.
+        self._buckets: Dict[int, OrderedDict] = {}
+        self._min_bucket: int = 0
 
         # Queue capacities
         self.s_capacity = max(1, int(sm_ratio * store.capacity))
         self.m_capacity = max(0, store.capacity - self.s_capacity)
 
         self.pos_alpha = float(pos_alpha)
+        # Per-request {key: PosBonus}, rebuilt only when the request list object changes.
+        # The list itself is kept (not its id()): a freed list's address can be reused by the next one
+        self._pos_cache_req: Optional[List[int]] = None
+        self._pos_cache_map: Dict[int, float] = {}
+
+        # Queue locator: resident key -> "S" / "M". Entries removed from the middle of a deque
+        # are not deleted (O(n)); they are counted as tombstones in _stale_S / _stale_M and
+        # skipped when they surface at the tail. _s_len / _m_len count live entries only.
+        self._loc: Dict[int, str] = {}
+        self._stale_S: Dict[int, int] = {}
+        self._stale_M: Dict[int, int] = {}
+        self._s_len = 0
+        self._m_len = 0
 
     # --------------------- Public API ---------------------
     def access(
@@ -50,30 +93,24 @@ class S3FIFO_Prio(KVCachePolicy):
         request_prefix_hash_ids: Optional[List[int]] = None,
         request_type=None,
     ) -> bool:
-        if self.store.contains(key):
+        resident = self._resident
+        if key in resident:
             # Update priority on hit
-            prio = self._calc_priority(
-                self._position_bonus(key, request_prefix_hash_ids)
-            )
-            meta = self._meta.get(key)
-            if meta is None:
-                meta = {"priority": prio, "version": 0}
-                self._meta[key] = meta
-            meta["priority"] = prio
-            meta["version"] += 1
-            heapq.heappush(self._heap, (prio, meta["version"], key))
+            prio = self.clock + self._position_bonus(key, request_prefix_hash_ids)
+            meta = self._meta
+            self._bucket_remove(key, meta[key])
+            meta[key] = prio
+            self._bucket_push(key, prio)
             # Promote S -> M on hit
-            if self._in_deque(self.S, key):
-                self._remove_from_deque(self.S, key)
-                self.M.appendleft(key)
+            if self._loc.get(key) == "S":
+                self._unlink(key)
+                self._push_M(key)
             return True
 
         # Miss path with admission gate by priority
-        prio_new = self._calc_priority(
-            self._position_bonus(key, request_prefix_hash_ids)
-        )
+        prio_new = self.clock + self._position_bonus(key, request_prefix_hash_ids)
 
-        if self.store.size() >= self.store.capacity:
+        if len(resident) >= self.store.capacity:
             min_pr, victim = self._peek_valid_min()
             if victim is not None and prio_new < min_pr:
                 # Reject admission
@@ -103,83 +140,102 @@ class S3FIFO_Prio(KVCachePolicy):
         return list(self._meta.keys())
 
     # --------------------- Internal helpers ---------------------
-    def _calc_priority(self, pos_bonus: float) -> float:
-        return self.clock + float(pos_bonus)
-
     def _position_bonus(
         self, key: int, request_prefix_hash_ids: Optional[List[int]]
     ) -> float:
-        ids = request_prefix_hash_ids or []
-        n = len(ids)
-        if n <= 0:
+        if not request_prefix_hash_ids:
             return 0.0
-        try:
-            i = ids.index(key)
-        except ValueError:
-            return 0.0
-        return self.pos_alpha * ((n - i) / n)
+        if self._pos_cache_req is not request_prefix_hash_ids:
+            self._pos_cache_map = self._compute_position_bonus(request_prefix_hash_ids)
+            self._pos_cache_req = request_prefix_hash_ids
+        return self._pos_cache_map.get(key, 0.0)
+
+    def _compute_position_bonus(self, ids: List[int]) -> Dict[int, float]:
+        # Duplicate keys keep their first position, matching list.index
+        n = len(ids)
+        alpha = self.pos_alpha
+        out: Dict[int, float] = {}
+        for i, k in enumerate(ids):
+            if k not in out:
+                out[k] = alpha * ((n - i) / n)
+        return out
 
     def _peek_valid_min(self) -> Tuple[Optional[float], Optional[int]]:
-        while self._heap:
-            prio, ver, k = self._heap[0]
-            meta = self._meta.get(k)
-            if (
-                meta is not None
-                and ver == meta.get("version")
-                and self.store.contains(k)
-            ):
-                return prio, k
-            heapq.heappop(self._heap)
-        return None, None
+        """Earliest key of the lowest non-empty bucket; (None, None) when empty"""
+        buckets = self._buckets
+        if not buckets:
+            return None, None
+        b = self._min_bucket
+        while b not in buckets:
+            b += 1
+        self._min_bucket = b
+        k = next(iter(buckets[b]))
+        return self._meta[k], k
+
+    def _bucket_push(self, key: int, prio: float) -> None:
+        b = int(prio * _BUCKETS_PER_UNIT)
+        bucket = self._buckets.get(b)
+        if bucket is None:
+            bucket = self._buckets[b] = OrderedDict()
+            if b < self._min_bucket or len(self._buckets) == 1:
+                self._min_bucket = b
+        bucket[key] = None
+
+    def _bucket_remove(self, key: int, prio: float) -> None:
+        b = int(prio * _BUCKETS_PER_UNIT)
+        bucket = self._buckets[b]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[b]
 
     def _admit_new(self, key: int, prio: float) -> None:
         self.store.add(key)
-        meta = {"priority": float(prio), "version": 0}
-        self._meta[key] = meta
-        heapq.heappush(self._heap, (prio, meta["version"], key))
+        self._meta[key] = prio
+        self._bucket_push(key, prio)
 
     def _evict_key(self, victim: int, evicted_priority: float) -> None:
         # Remove from queues
-        self._remove_from_deque(self.S, victim)
-        self._remove_from_deque(self.M, victim)
+        self._unlink(victim)
         # Update structures
         self.store.delete(victim)
-        self._meta.pop(victim, None)
+        self._bucket_remove(victim, self._meta.pop(victim))
         self.clock = max(self.clock, float(evicted_priority))
         # Record in ghost
         self.ghost.add(victim)
 
     def _ensure_space_and_insert_S(self, key: int) -> None:
         # Prefer evict from S tail if S over target, else from M
-        if len(self.S) >= self.s_capacity:
+        if self._s_len >= self.s_capacity:
             self._evict_from_S_tail()
-        elif self.store.size() > self.store.capacity:
+        elif len(self._resident) > self.store.capacity:
             self._evict_lowest_priority()
-        self.S.appendleft(key)
+        self._push_S(key)
 
     def _ensure_space_and_insert_M(self, key: int) -> None:
-        if len(self.M) >= self.m_capacity:
+        if self._m_len >= self.m_capacity:
             self._evict_from_M_tail_or_rotate()
-        elif self.store.size() > self.store.capacity:
+        elif len(self._resident) > self.store.capacity:
             self._evict_lowest_priority()
-        self.M.appendleft(key)
+        self._push_M(key)
 
     def _evict_from_S_tail(self) -> None:
-        if not self.S:
+        t = self._pop_tail(self.S, self._stale_S)
+        if t is None:
             return
-        t = self.S.pop()
+        del self._loc[t]
+        self._s_len -= 1
         # S-tail eviction is real eviction (priority-aware clock)
-        meta = self._meta.get(t)
-        prio = meta["priority"] if meta else 0.0
+        prio = self._meta.get(t, 0.0)
         self._evict_key(t, evicted_priority=prio)
 
     def _evict_from_M_tail_or_rotate(self) -> None:
-        if not self.M:
-            return
         # In pure FIFO, tail eviction; we keep FIFO but still update clock by victim's priority.
-        t = self.M.pop()
-        meta = self._meta.get(t)
-        prio = meta["priority"] if meta else 0.0
+        t = self._pop_tail(self.M, self._stale_M)
+        if t is None:
+            return
+        del self._loc[t]
+        self._m_len -= 1
+        prio = self._meta.get(t, 0.0)
         self._evict_key(t, evicted_priority=prio)
 
     def _evict_lowest_priority(self) -> None:
@@ -189,17 +245,59 @@ class S3FIFO_Prio(KVCachePolicy):
                 victim, evicted_priority=min_pr if min_pr is not None else 0.0
             )
 
-    @staticmethod
-    def _in_deque(dq: deque, key: int) -> bool:
-        return key in dq
+    def _push_S(self, key: int) -> None:
+        self.S.appendleft(key)
+        self._loc[key] = "S"
+        self._s_len += 1
+
+    def _push_M(self, key: int) -> None:
+        self.M.appendleft(key)
+        self._loc[key] = "M"
+        self._m_len += 1
+
+    def _unlink(self, key: int) -> None:
+        """Detach a resident key from its queue by tombstoning its deque entry (O(1))"""
+        tag = self._loc.pop(key, None)
+        if tag == "S":
+            self._s_len -= 1
+            self._tombstone(self.S, self._stale_S, key, self._s_len, "S")
+        elif tag == "M":
+            self._m_len -= 1
+            self._tombstone(self.M, self._stale_M, key, self._m_len, "M")
+
+    def _tombstone(
+        self, dq: deque, stale: Dict[int, int], key: int, live: int, tag: str
+    ) -> None:
+        stale[key] = stale.get(key, 0) + 1
+        # Rebuild once more than 25% of the deque is dead, so compaction stays amortized O(1)
+        if 4 * (len(dq) - live) > len(dq):
+            self._compact(dq, stale, tag)
+
+    def _compact(self, dq: deque, stale: Dict[int, int], tag: str) -> None:
+        # A key's live entry is its newest (leftmost) one; older duplicates are tombstones
+        loc_get = self._loc.get
+        seen = set()
+        live = []
+        for k in dq:
+            if k not in seen and loc_get(k) == tag:
+                seen.add(k)
+                live.append(k)
+        dq.clear()
+        dq.extend(live)
+        stale.clear()
 
     @staticmethod
-    def _remove_from_deque(dq: deque, key: int) -> None:
-        if not dq:
-            return
-        # Remove first occurrence
-        try:
-            idx = dq.index(key)
-            del dq[idx]
-        except ValueError:
-            pass
+    def _pop_tail(dq: deque, stale: Dict[int, int]) -> Optional[int]:
+        """Pop the oldest live key, discarding tombstones that surface at the tail"""
+        while dq:
+            t = dq.pop()
+            n = stale.get(t)
+            if n:
+                # Tombstones of a key are always older than its live entry
+                if n == 1:
+                    del stale[t]
+                else:
+                    stale[t] = n - 1
+                continue
+            return t
+        return None
@@ -1,20 +1,29 @@
+from typing import Optional, Set
+
+
 class KVCacheStore:
-    def __init__(self, capacity: int):
+    # contains / delete / delete_many / size are bound directly to the underlying set's
+    # methods in __init__, so calls skip a Python-level wrapper frame on the policy hot path
+    __slots__ = ("capacity", "_set", "contains", "delete", "delete_many", "size")
+
+    def __init__(self, capacity: int, resident: Optional[Set[int]] = None):
         if capacity <= 0:
             raise ValueError("capacity must be positive")
         self.capacity = capacity
-        self._set = set()
+        # An externally provided set is used as-is (shared, not copied)
+        self._set = resident if resident is not None else set()
+        self.contains = self._set.__contains__  # (prefix_hash_id) -> bool
+        self.delete = self._set.discard  # (prefix_hash_id) -> None
+        self.delete_many = self._set.difference_update  # (prefix_hash_ids) -> None
+        self.size = self._set.__len__  # () -> int
+
+    @property
+    def resident(self) -> Set[int]:
+        """The live set of stored ids. Policies read it directly instead of calling
+        contains()/size() on their hot paths; all writes still go through add/delete."""
+        return self._set
 
     def add(self, prefix_hash_id: int):
         self._set.add(prefix_hash_id)
         if len(self._set) > self.capacity:
             raise RuntimeError("KVCacheStore is at capacity; cannot add")
-
-    def delete(self, prefix_hash_id: int):
-        self._set.discard(prefix_hash_id)
-
-    def contains(self, prefix_hash_id: int) -> bool:
-        return prefix_hash_id in self._set
-
-    def size(self) -> int:
-        return len(self._set)
@@ -1,6 +1,54 @@
 import json
 import os
 import glob
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to the stdlib parser / str.join
+    orjson = None
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+# Encoded output lines are buffered and written in batches of this many lines
+_WRITE_BATCH = 4096
+
+
+def _ids_bytes(block_ids) -> bytes:
+    """Comma-joined ids as bytes, e.g. [1, 2, 3] -> b"1,2,3" (str() of each id, as before)."""
+    # orjson writes strings quoted and bools / None as JSON literals, so it only takes plain ints
+    if orjson is not None and all(type(i) is int for i in block_ids):
+        try:
+            # b"[1,2,3]" -> b"1,2,3": the whole list is serialized in C
+            return orjson.dumps(block_ids)[1:-1]
+        except TypeError:  # ints beyond 64 bits
+            pass
+    return ",".join(map(str, block_ids)).encode()
+
+
+def _records(data, type_mapping):
+    """Yield (block_ids, req_type) for every non-empty id list of one parsed JSONL line."""
+    # Nested format with "block_ids"
+    if "requests" in data:
+        req_type = 1
+        for request in data.get("requests", []):
+            for turn in request.get("turns", []):
+                for llm_message in turn.get("llm_messages", []):
+                    for chunk in llm_message.get("chunks", []):
+                        block_ids = chunk.get("block_ids", [])
+                        if block_ids:
+                            yield block_ids, req_type
+    else:
+        block_ids = data.get("hash_ids", [])
+        req_type = 1  # Default type
+
+        # Check if it's the format with a "type" field
+        if "type" in data:
+            req_type_str = data.get("type", "text")
+            req_type = type_mapping.get(req_type_str, 1)
+
+        if block_ids:
+            yield block_ids, req_type
 
 
 def process_jsonl_to_custom_format(input_file, output_file):
@@ -12,42 +60,28 @@ def process_jsonl_to_custom_format(input_file, output_file):
     }
 
     try:
-        with open(output_file, "w", encoding="utf-8") as outfile:
-            with open(input_file, "r", encoding="utf-8") as infile:
+        with open(output_file, "wb") as outfile:
+            pending = []  # encoded lines not yet written
+            emit = pending.append
+            with open(input_file, "rb") as infile:
                 for line in infile:
                     line = line.strip()
                     if not line:
                         continue
 
-                    data = json.loads(line)
-                    output_line = None
-
-                    # Nested format with "block_ids"
-                    if "requests" in data:
-                        req_type = 1
-                        for request in data.get("requests", []):
-                            for turn in request.get("turns", []):
-                                for llm_message in turn.get("llm_messages", []):
-                                    for chunk in llm_message.get("chunks", []):
-                                        block_ids = chunk.get("block_ids", [])
-                                        if block_ids:
-                                            ids_str = ",".join(map(str, block_ids))
-                                            outfile.write(f"{{{ids_str}}} {req_type}\n")
-                    else:
-                        block_ids = data.get("hash_ids", [])
-                        req_type = 1  # Default type
-
-                        # Check if it's the format with a "type" field
-                        if "type" in data:
-                            req_type_str = data.get("type", "text")
-                            req_type = type_mapping.get(req_type_str, 1)
+                    records = list(_records(_loads(line), type_mapping))
+                    if _loads is not json.loads and any(
+                        float in map(type, block_ids) for block_ids, _ in records
+                    ):
+                        # orjson reads integers beyond 64 bits as floats; json keeps them exact
+                        records = list(_records(json.loads(line), type_mapping))
+                    for block_ids, req_type in records:
+                        emit(b"{%s} %d\n" % (_ids_bytes(block_ids), req_type))
 
-                        if block_ids:
-                            ids_str = ",".join(map(str, block_ids))
-                            output_line = f"{{{ids_str}}} {req_type}\n"
-
-                    if output_line:
-                        outfile.write(output_line)
+                    if len(pending) >= _WRITE_BATCH:
+                        outfile.write(b"".join(pending))
+                        pending.clear()
+            outfile.write(b"".join(pending))
 
         print(f"Processed {input_file} -> {output_file}")
 
@@ -59,6 +93,15 @@ def process_jsonl_to_custom_format(input_file, output_file):
         print(f"An unexpected error occurred while processing {input_file}: {e}")
 
 
+def process_one(input_path, output_dir):
+    """Convert one raw JSONL file into output_dir/<basename without extension>."""
+    base_name = os.path.basename(input_path)
+    output_name = os.path.splitext(base_name)[0]
+    output_path = os.path.join(output_dir, output_name)
+
+    process_jsonl_to_custom_format(input_path, output_path)
+
+
 if __name__ == "__main__":
     input_dir = "input_samples/raw/"
     output_dir = "input_samples/"
@@ -69,10 +112,8 @@ if __name__ == "__main__":
         jsonl_files = glob.glob(os.path.join(input_dir, "*.jsonl"))
         if not jsonl_files:
             print(f"No .jsonl files found in {input_dir}")
-
-        for input_path in jsonl_files:
-            base_name = os.path.basename(input_path)
-            output_name = os.path.splitext(base_name)[0]
-            output_path = os.path.join(output_dir, output_name)
-
-            process_jsonl_to_custom_format(input_path, output_path)
+        else:
+            # Files are independent: convert them in parallel, one worker per file (up to #cores)
+            workers = min(len(jsonl_files), os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                list(ex.map(process_one, jsonl_files, [output_dir] * len(jsonl_files)))
@@ -1,15 +1,30 @@
 import sys
 import argparse
-from typing import Iterable, List, Tuple
+import gc
+import glob
+import hashlib
+import json
+import mmap
+import re
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from typing import Iterable, Iterator, List, Tuple
 import os
 import time
+import numpy as np
 import yaml
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mticker
 
 from kvcachepolicy import *
 from kvstore import KVCacheStore
 
+# libyaml-backed loader when PyYAML was built with it
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+# "<anything but braces>{ids}rest": the ids and the rest of a data line in one scan
+_SAMPLE_LINE_RE = re.compile(r"[^{}]*\{([^}]*)\}(.*)")
+
 
 def parse_sample_line(line: str) -> Tuple[List[int], int]:
     """Parse a line like "{1,2,3,4} 1" into (prefix_ids, req_type)."""
@@ -17,18 +32,26 @@ def parse_sample_line(line: str) -> Tuple[List[int], int]:
     if not line or line.startswith("#"):
         raise ValueError("empty/comment line encountered in data section")
 
-    try:
-        brace_l = line.index("{")
-        brace_r = line.index("}")
-    except ValueError as e:
-        raise ValueError(f"invalid line (missing braces): {line}") from e
-
-    cand_part = line[brace_l + 1 : brace_r].strip()
-    rest = line[brace_r + 1 :].strip()
-    # prefix ids
+    m = _SAMPLE_LINE_RE.match(line)
+    if m is not None:
+        cand_part, rest = m.groups()
+    else:
+        # No well-formed "{...}": locate the braces by hand for the same slicing / error
+        try:
+            brace_l = line.index("{")
+            brace_r = line.index("}")
+        except ValueError as e:
+            raise ValueError(f"invalid line (missing braces): {line}") from e
+        cand_part = line[brace_l + 1 : brace_r]
+        rest = line[brace_r + 1 :]
+    # prefix ids (int() ignores surrounding whitespace)
     prefix_ids: List[int] = []
     if cand_part:
-        prefix_ids = [int(x.strip()) for x in cand_part.split(",") if x.strip()]
+        try:
+            prefix_ids = [int(x) for x in cand_part.split(",")]
+        except ValueError:
+            # blank entries ("1,,2", "{ }") are skipped; anything else still raises
+            prefix_ids = [int(x) for x in cand_part.split(",") if x.strip()]
     # request type: last integer in the rest (ignored for FIFO)
     tokens = rest.split()
     if not tokens:
@@ -37,9 +60,183 @@ def parse_sample_line(line: str) -> Tuple[List[int], int]:
     return prefix_ids, req_type
 
 
+# One "{ids} ... type" record: group 1 = the ids between the braces, group 2 = rest of the line
+_LINE_RE = re.compile(rb"\{([^}]*)\}([^\n]*)")
+# One match per non-blank line; the group keeps findall results to 1-byte objects
+_NONBLANK_LINE_RE = re.compile(rb"(\S)[^\n]*")
+# An empty id entry ("{ }", "{1,,2}", "{1, ,2}", "{,1}", "{1,}") in the comma-joined bodies,
+# once they are wrapped in commas
+_EMPTY_ID_RE = re.compile(rb",\s*,")
+# A carriage return that is not part of "\r\n": a line end of its own in text mode
+_BARE_CR_RE = re.compile(rb"\r(?!\n)")
+# np.fromstring saturates out-of-range ids to these bounds instead of failing
+_INT64_MIN, _INT64_MAX = int(np.iinfo(np.int64).min), int(np.iinfo(np.int64).max)
+# ids converted to Python ints per step when canonicalising
+_CANON_CHUNK = 1 << 16
+# Below this size the regex path is as fast as loading the compiled tokenizer
+_COMPILED_PARSE_MIN_BYTES = 1 << 20
+
+
 def load_input(path: str) -> List[Tuple[List[int], int]]:
-    with open(path, "r", encoding="utf-8") as f:
-        lines = [ln.strip() for ln in f if ln.strip()]
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError("input file is empty")  # an empty file cannot be mapped
+        # Parse straight from the page cache: no decoded copy of the whole file
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            if hasattr(buf, "madvise"):  # Python 3.8+, Unix only
+                buf.madvise(mmap.MADV_SEQUENTIAL)
+            traces = _load_input_fast(buf)
+            if traces is None:
+                # Unusual formatting (comments, empty tokens, malformed lines...): the per-line
+                # parser handles it and raises the precise error for bad lines
+                traces = _load_input_lines(buf[:].decode("utf-8"))
+    return traces
+
+
+def prefetch_input(path: str) -> None:
+    """Ask the kernel to start reading `path` into the page cache in the background.
+
+    Best effort: a no-op where posix_fadvise is unavailable (macOS, Windows) or the file
+    cannot be opened; load_input reports real errors later.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _load_input_fast(buf) -> "List[Tuple[List[int], int]] | None":
+    """Bulk parse of a bytes-like buffer into per-request lists.
+
+    Returns None whenever the buffer is not in the plain "{1,2,3} type" form.
+    """
+    tokens = None
+    if len(buf) >= _COMPILED_PARSE_MIN_BYTES:
+        tokens = _tokenize_compiled(buf)
+    if tokens is None:
+        tokens = _tokenize_regex(buf)
+    if tokens is None:
+        return None
+    ids, counts, req_types = tokens
+
+    # Equal ids share one int object: O(distinct ids) objects instead of O(tokens).
+    # Converted in chunks so only one chunk of duplicate ints is alive at a time
+    canonical = {}.setdefault
+    flat: List[int] = []
+    for start in range(0, ids.size, _CANON_CHUNK):
+        chunk = ids[start : start + _CANON_CHUNK].tolist()
+        flat.extend(map(canonical, chunk, chunk))
+    del canonical  # drop the lookup dict before building the per-request lists
+
+    traces: List[Tuple[List[int], int]] = []
+    # Building ~one list per line would otherwise trigger repeated full GC passes
+    # over the growing (acyclic) result
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        pos = 0
+        for n, req_type in zip(counts, req_types):
+            traces.append((flat[pos : pos + n], req_type))
+            pos += n
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return traces
+
+
+def _tokenize_compiled(buf):
+    """(ids, counts, req_types) from the numba tokenizer, or None (no numba / not plain)."""
+    from _trace_numba import HAS_NUMBA, parse_trace
+
+    if not HAS_NUMBA:
+        return None
+    ok, ids, counts, req_types = parse_trace(np.frombuffer(buf, dtype=np.uint8))
+    if not ok or not counts.size:
+        return None
+    return ids, counts.tolist(), req_types.tolist()
+
+
+def _tokenize_regex(buf):
+    """(ids, counts, req_types) via regexes and one np.fromstring call, or None (not plain)."""
+    if buf.find(b"#") != -1:
+        return None
+    # Records are split on "\n" only; old Mac style "\r" line ends go to the line parser
+    if buf.find(b"\r") != -1 and _BARE_CR_RE.search(buf):
+        return None
+    rows = _LINE_RE.findall(buf)
+    # Exactly one record per non-blank line (this also rules out records spanning lines)
+    if not rows or len(rows) != len(_NONBLANK_LINE_RE.findall(buf)):
+        return None
+    bodies = [body for body, _ in rows]
+    counts = [body.count(b",") + 1 if body else 0 for body in bodies]
+    joined = b",".join(filter(None, bodies))
+    # fromstring reads an empty entry as 0; the line parser skips it instead
+    if joined and _EMPTY_ID_RE.search(b"," + joined + b","):
+        return None
+    try:
+        with warnings.catch_warnings():
+            # fromstring only warns (and stops early) on unparsable input
+            warnings.simplefilter("error", DeprecationWarning)
+            ids = np.fromstring(joined, dtype=np.int64, sep=",")
+        req_types = [int(rest.split()[-1]) for _, rest in rows]
+    except (ValueError, IndexError, DeprecationWarning):
+        return None
+    if ids.size != sum(counts):
+        return None
+    if ids.size and (int(ids.min()) == _INT64_MIN or int(ids.max()) == _INT64_MAX):
+        return None  # possibly saturated ids beyond int64: keep exact Python ints
+    return ids, counts, req_types
+
+
+def iter_input(path: str, block_size: int = 1 << 22) -> Iterator[Tuple[List[int], int]]:
+    """Yield the (prefix_ids, req_type) records of load_input one by one.
+
+    The file is parsed in blocks of about block_size bytes (cut at line ends), so memory
+    stays bounded by one block instead of the whole trace.
+    """
+    empty = True
+    with open(path, "rb") as f:
+        tail = b""
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            block = tail + block
+            cut = block.rfind(b"\n") + 1
+            tail = block[cut:]
+            if cut:
+                for record in _parse_block(block[:cut]):
+                    empty = False
+                    yield record
+        for record in _parse_block(tail):
+            empty = False
+            yield record
+    if empty:
+        raise ValueError("input file is empty")
+
+
+def _parse_block(buf: bytes) -> List[Tuple[List[int], int]]:
+    traces = _load_input_fast(buf)
+    if traces is None:
+        traces = [parse_sample_line(ln) for ln in _split_lines(buf.decode("utf-8")) if ln.strip()]
+    return traces
+
+
+def _split_lines(text: str) -> List[str]:
+    """Split text into lines like a text-mode file does ("\n", "\r\n" and "\r" end a line)."""
+    return text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+
+
+def _load_input_lines(text: str) -> List[Tuple[List[int], int]]:
+    lines = [ln.strip() for ln in _split_lines(text) if ln.strip()]
     if not lines:
         raise ValueError("input file is empty")
     traces: List[Tuple[List[int], int]] = []
@@ -51,11 +248,163 @@ def load_input(path: str) -> List[Tuple[List[int], int]]:
 def evaluate(policy: KVCachePolicy, traces: Iterable[Tuple[List[int], int]]) -> dict:
     total = 0
     hits = 0
+    access_prefix = policy.access_prefix  # bound once, not looked up per request
     for prefix_ids, req_type in traces:
-        for pid in prefix_ids:
-            total += 1
-            if policy.access(pid, prefix_ids, req_type):
-                hits += 1
+        total += len(prefix_ids)
+        hits += access_prefix(prefix_ids, req_type)
+    return make_stats(total, hits)
+
+
+def run_file(policy: KVCachePolicy, path: str) -> dict:
+    """Fused parse + replay of a sample file.
+
+    Each block of the file is parsed and its requests are fed to the policy right away, so
+    only one block of parsed requests is alive at a time (no whole-trace list).
+    """
+    return evaluate(policy, iter_input(path))
+
+
+def flatten_traces(traces: List[Tuple[List[int], int]]) -> np.ndarray:
+    """Concatenate every request's prefix ids into one int64 array (trace order)."""
+    total = sum(len(prefix_ids) for prefix_ids, _ in traces)
+    return np.fromiter(
+        chain.from_iterable(prefix_ids for prefix_ids, _ in traces),
+        dtype=np.int64,
+        count=total,
+    )
+
+
+def evaluate_s3fifo_jit(dense_trace: Tuple[np.ndarray, int], capacity: int) -> dict:
+    """Replay the whole trace with the array-based S3FIFO kernel (numba-compiled if available).
+
+    dense_trace: `densify(flatten_traces(traces))`, shared by all capacities of a dataset.
+    """
+    from kvcachepolicy.s3_fifo_core import s3fifo_replay_ids
+
+    dense, n_ids = dense_trace
+    return make_stats(int(dense.size), s3fifo_replay_ids(dense, n_ids, capacity))
+
+
+def make_policy(policy_name: str, store: KVCacheStore) -> KVCachePolicy:
+    if policy_name == "S3FIFO":
+        return S3FIFO(store=store)
+    elif policy_name == "S3FIFO_TinyLFU":
+        return S3FIFO(store=store, admission_filter=True)
+    elif policy_name == "LFU":
+        return LFU(store=store)
+    elif policy_name == "LRU_PRO":
+        return LFU_PRO(store=store)
+    elif policy_name == "GDFS":
+        return GDFS(store=store)
+    elif policy_name == "S3FIFO_Prio":
+        return S3FIFO_Prio(store=store)
+    elif policy_name == "S3FIFO_Attn":
+        return S3FIFO_Attn(store=store)
+    raise ValueError(f"Unsupported policy: {policy_name}")
+
+
+def load_dataset(input_path: str, jit: bool = False):
+    """Parse a sample file; with jit also return its densified id stream (else None)."""
+    traces = load_input(input_path)
+    dense_trace = None
+    if jit:
+        # The kernel works on dense int64 ids; remap once for all capacities
+        from kvcachepolicy.s3_fifo_core import densify
+
+        dense_trace = densify(flatten_traces(traces))
+    return traces, dense_trace
+
+
+def run_capacity(policy_name: str, capacity: int, traces, dense_trace=None) -> dict:
+    """Replay one dataset at one capacity; a dense_trace selects the --jit S3FIFO kernel."""
+    if dense_trace is not None:
+        return evaluate_s3fifo_jit(dense_trace, capacity)
+    # policy = S3FIFOWithGDSAdmission(store=store)
+    return evaluate(make_policy(policy_name, KVCacheStore(capacity=capacity)), traces)
+
+
+# Worker process state for --jobs: the dataset its previous job used, kept while jobs share it
+_worker_dataset = {}
+
+
+def _run_job(input_path: str, capacity: int, policy_name: str, jit: bool, stream: bool):
+    if stream:
+        start_time = time.perf_counter()
+        stats = run_file(make_policy(policy_name, KVCacheStore(capacity=capacity)), input_path)
+        return stats, time.perf_counter() - start_time
+    data = _worker_dataset.get(input_path)
+    if data is None:
+        _worker_dataset.clear()  # hold one dataset per worker at a time
+        data = _worker_dataset[input_path] = load_dataset(input_path, jit)
+    start_time = time.perf_counter()
+    stats = run_capacity(policy_name, capacity, *data)
+    return stats, time.perf_counter() - start_time
+
+
+def code_digest() -> bytes:
+    """Digest of the policy / store / parser / replay sources: cached results are only valid
+    for the same code."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    paths = sorted(glob.glob(os.path.join(root, "kvcachepolicy", "*.py")))
+    # kvstore.py holds the store; this file and _trace_numba.py parse and replay the traces
+    paths += [os.path.join(root, name) for name in ("kvstore.py", "test.py", "_trace_numba.py")]
+    h = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.digest()
+
+
+def dataset_digest(input_path: str, salt: bytes) -> str:
+    """blake2b of a sample file's bytes, salted with code_digest()."""
+    h = hashlib.blake2b(salt, digest_size=16)
+    with open(input_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_cached_stats(path: str):
+    """Stats dict stored by save_cached_stats, or None if absent/unreadable."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_cached_stats(path: str, stats: dict) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(stats, f)
+    os.replace(tmp_path, path)  # atomic: concurrent runs never see a partial file
+
+
+def print_stats_table(stats: dict, duration: float) -> None:
+    rows = [
+        ("Total requests", f"{stats['total']:,}"),
+        ("Hits", f"{stats['hits']:,}"),
+        ("Misses", f"{stats['misses']:,}"),
+        ("Hit Ratio", f"{stats['hit_ratio']:.5%}"),
+        ("Time elapsed", f"{duration:.5f}s"),
+    ]
+    headers = [k for k, _ in rows]
+    values = [v for _, v in rows]
+    widths = [max(len(h), len(v)) for h, v in zip(headers, values)]
+
+    top = "+-" + "-+-".join("-" * w for w in widths) + "-+"
+    sep = "+=" + "=+=".join("=" * w for w in widths) + "=+"
+    header_line = (
+        "| " + " | ".join(h.ljust(w) for h, w in zip(headers, widths)) + " |"
+    )
+    value_line = "| " + " | ".join(v.rjust(w) for v, w in zip(values, widths)) + " |"
+
+    # One write per table instead of five
+    print("\n".join((top, header_line, sep, value_line, top)))
+
+
+def make_stats(total: int, hits: int) -> dict:
     misses = total - hits
     hit_ratio = hits / total if total else 0.0
     return {
@@ -72,29 +421,65 @@ def plot_and_save_results(
     hit_ratios: List[float],
     output_dir: str,
     timestamp: str,
+    fig=None,
 ):
-    """Plots hit ratio vs. capacity and saves the figure."""
-    plt.figure()
-    plt.plot(capacities, hit_ratios, marker="o", linestyle="-")
-    plt.title(f"Hit Ratio vs. Capacity for {dataset_name}")
-    plt.xlabel("Capacity")
-    plt.ylabel("Hit Ratio")
-    plt.grid(True, which="both", linestyle="--", linewidth=0.5)
+    """Plots hit ratio vs. capacity and saves the figure.
+
+    matplotlib is imported on first use. Returns the figure; pass it back as `fig` for the
+    next dataset to redraw one figure instead of creating new ones.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")  # files only: no GUI toolkit / interactive backend
+    import matplotlib.ticker as mticker
+    from matplotlib.figure import Figure
+
+    if fig is None:
+        fig = Figure()
+    fig.clear()
+    ax = fig.add_subplot()
+    ax.plot(capacities, hit_ratios, marker="o", linestyle="-")
+    ax.set_title(f"Hit Ratio vs. Capacity for {dataset_name}")
+    ax.set_xlabel("Capacity")
+    ax.set_ylabel("Hit Ratio")
+    ax.grid(True, which="both", linestyle="--", linewidth=0.5)
 
     # Format y-axis as percentage
-    plt.gca().yaxis.set_major_formatter(mticker.PercentFormatter(xmax=1.0))
+    ax.yaxis.set_major_formatter(mticker.PercentFormatter(xmax=1.0))
 
     # Ensure x-axis ticks are integers
-    plt.xticks(capacities)
-    plt.xticks(rotation=45)
+    ax.set_xticks(capacities)
+    ax.tick_params(axis="x", labelrotation=45)
 
-    plt.tight_layout()
+    fig.tight_layout()
 
     output_filename = f"{dataset_name}_{timestamp}.png"
     output_path = os.path.join(output_dir, output_filename)
-    plt.savefig(output_path)
-    plt.close()
+    fig.savefig(output_path)
     print(f"--- Chart saved to {output_path} ---\n")
+    return fig
+
+
+def replot_results(paths: List[str], output_dir: str, timestamp: str) -> None:
+    """Redraw hit-ratio charts from "<dataset>_<run timestamp>.npy" result files."""
+    fig = None
+    for path in paths:
+        try:
+            capacities, hit_ratios = np.load(path)
+        except (OSError, ValueError) as e:
+            print(f"Error reading results from '{path}': {e}")
+            continue
+        name = os.path.splitext(os.path.basename(path))[0]
+        parts = name.rsplit("_", 2)  # strip the "_%Y%m%d_%H%M%S" suffix if present
+        dataset_name = parts[0] if len(parts) == 3 and (parts[1] + parts[2]).isdigit() else name
+        fig = plot_and_save_results(
+            dataset_name,
+            capacities.astype(np.int64).tolist(),
+            hit_ratios.tolist(),
+            output_dir,
+            timestamp,
+            fig,
+        )
 
 
 def main():
@@ -122,15 +507,77 @@ def main():
         default="S3FIFO",
         help="Cache eviction policy to use.",
     )
+    parser.add_argument(
+        "--jit",
+        action="store_true",
+        help="Replay with the numba-compiled S3FIFO kernel (only for --policy S3FIFO).",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for the (dataset, capacity) runs; 0 = one per CPU core.",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Reuse results stored under output/.cache for the same sample file contents, "
+        "capacity, policy and policy source code; store new ones there.",
+    )
+    parser.add_argument(
+        "--replot-from",
+        nargs="+",
+        metavar="NPY",
+        help="Only redraw charts from result files (.npy) saved by earlier runs; "
+        "no traces are parsed or replayed.",
+    )
+    parser.add_argument(
+        "--pin-cpu",
+        type=int,
+        default=None,
+        metavar="CPU",
+        help="Pin the run to one CPU core (Linux) for steadier timings; serial runs only.",
+    )
+    parser.add_argument(
+        "--no-plot",
+        action="store_true",
+        help="Skip the hit-ratio charts (matplotlib is then never imported).",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Re-parse the sample file block by block for every capacity instead of keeping "
+        "the parsed trace in memory (Time elapsed then includes parsing).",
+    )
     args = parser.parse_args()
+    if args.jit and args.policy != "S3FIFO":
+        parser.error(f"--jit is not supported for policy: {args.policy}")
+    if args.jit and args.stream:
+        parser.error("--stream cannot be combined with --jit")
+    if args.jobs < 0:
+        parser.error("--jobs must be >= 0")
+    if args.pin_cpu is not None:
+        # Worker processes would inherit the single-core mask
+        if args.jobs != 1:
+            parser.error("--pin-cpu cannot be combined with --jobs")
+        if not hasattr(os, "sched_setaffinity"):
+            parser.error("--pin-cpu is only supported on Linux")
+        try:
+            os.sched_setaffinity(0, {args.pin_cpu})
+        except (OSError, ValueError) as e:
+            parser.error(f"cannot pin to CPU {args.pin_cpu}: {e}")
 
     run_timestamp = time.strftime("%Y%m%d_%H%M%S")
     output_dir = "output"
     os.makedirs(output_dir, exist_ok=True)
 
+    if args.replot_from:
+        replot_results(args.replot_from, output_dir, run_timestamp)
+        return
+
     try:
         with open(args.config, "r", encoding="utf-8") as f:
-            config = yaml.safe_load(f)
+            config = yaml.load(f, Loader=_YamlLoader)
     except FileNotFoundError:
         print(f"Error: Config file not found at '{args.config}'")
         return
@@ -142,6 +589,8 @@ def main():
         print(f"Error: No 'tests' defined in '{args.config}'.")
         return
 
+    # Validate the whole test list first: (sample_file, input_path, capacities) per dataset
+    datasets = []
     for test_config in config["tests"]:
         sample_file = test_config.get("file")
         capacities = test_config.get("capacities", [])
@@ -162,63 +611,78 @@ def main():
         if not os.path.isfile(input_path):
             print(f"--- Skipping test for missing file: {sample_file} ---\n")
             continue
+        datasets.append((sample_file, input_path, capacities))
+
+    # --cache: (input_path, capacity) -> cache file, and the results already stored there
+    cache_paths = {}
+    cached = {}
+    if args.cache:
+        cache_dir = os.path.join(output_dir, ".cache")
+        salt = code_digest()
+        for _, input_path, capacities in datasets:
+            digest = dataset_digest(input_path, salt)
+            for capacity in capacities:
+                path = os.path.join(cache_dir, f"{digest}_{capacity}_{args.policy}.json")
+                cache_paths[(input_path, capacity)] = path
+                stats = load_cached_stats(path)
+                if stats is not None:
+                    cached[(input_path, capacity)] = stats
+
+    # --jobs: every (dataset, capacity) run is submitted to worker processes up front;
+    # results are still printed and plotted below, in config order
+    pool = None
+    futures = {}
+    if args.jobs != 1 and datasets:
+        pool = ProcessPoolExecutor(max_workers=args.jobs or os.cpu_count() or 1)
+        for _, input_path, capacities in datasets:
+            for capacity in capacities:
+                if (input_path, capacity) in cached:
+                    continue
+                futures[(input_path, capacity)] = pool.submit(
+                    _run_job, input_path, capacity, args.policy, args.jit, args.stream
+                )
+
+    fig = None  # one chart figure, created by the first plot and redrawn for every dataset
+    for i, (sample_file, input_path, capacities) in enumerate(datasets):
+        if pool is None and i + 1 < len(datasets):
+            # Warm the next dataset's file while this one is being evaluated
+            prefetch_input(datasets[i + 1][1])
 
         print(f"==== Testing Dataset: {sample_file} ====")
 
+        all_cached = all((input_path, capacity) in cached for capacity in capacities)
+        if pool is None and not args.stream and not all_cached:
+            # Parse once per dataset; every capacity replays the same (read-only) traces
+            try:
+                start_time = time.perf_counter()
+                traces, dense_trace = load_dataset(input_path, args.jit)
+                print(f"  Loaded {len(traces):,} requests in {time.perf_counter() - start_time:.5f}s\n")
+            except Exception as e:
+                print(f"    Error loading {sample_file}: {e}\n")
+                continue
+
         results_hit_ratios = []
         for capacity in capacities:
             print(f"  --- Running with capacity: {capacity} ---")
             try:
-                start_time = time.time()
-                traces = load_input(input_path)
-                store = KVCacheStore(capacity=capacity)
-                # policy = S3FIFOWithGDSAdmission(store=store)
-                if args.policy == "S3FIFO":
-                    policy = S3FIFO(store=store)
-                elif args.policy == "LFU":
-                    policy = LFU(store=store)
-                elif args.policy == "LRU_PRO":
-                    policy = LFU_PRO(store=store)
-                elif args.policy == "GDFS":
-                    policy = GDFS(store=store)
-                elif args.policy == "S3FIFO_Prio":
-                    policy = S3FIFO_Prio(store=store)
-                elif args.policy == "S3FIFO_Attn":
-                    policy = S3FIFO_Attn(store=store)
+                if (input_path, capacity) in cached:
+                    print("  (cached result)")
+                    stats, duration = cached[(input_path, capacity)], 0.0
+                elif pool is None:
+                    start_time = time.perf_counter()
+                    if args.stream:
+                        policy = make_policy(args.policy, KVCacheStore(capacity=capacity))
+                        stats = run_file(policy, input_path)
+                    else:
+                        stats = run_capacity(args.policy, capacity, traces, dense_trace)
+                    duration = time.perf_counter() - start_time
                 else:
-                    raise ValueError(f"Unsupported policy: {args.policy}")
-                stats = evaluate(policy, traces)
-                duration = time.time() - start_time
+                    stats, duration = futures[(input_path, capacity)].result()
+                if args.cache and (input_path, capacity) not in cached:
+                    save_cached_stats(cache_paths[(input_path, capacity)], stats)
 
                 results_hit_ratios.append(stats["hit_ratio"])
-
-                rows = [
-                    ("Total requests", f"{stats['total']:,}"),
-                    ("Hits", f"{stats['hits']:,}"),
-                    ("Misses", f"{stats['misses']:,}"),
-                    ("Hit Ratio", f"{stats['hit_ratio']:.5%}"),
-                    ("Time elapsed", f"{duration:.5f}s"),
-                ]
-                headers = [k for k, _ in rows]
-                values = [v for _, v in rows]
-                widths = [max(len(h), len(v)) for h, v in zip(headers, values)]
-
-                top = "+-" + "-+-".join("-" * w for w in widths) + "-+"
-                sep = "+=" + "=+=".join("=" * w for w in widths) + "=+"
-                header_line = (
-                    "| "
-                    + " | ".join(h.ljust(w) for h, w in zip(headers, widths))
-                    + " |"
-                )
-                value_line = (
-                    "| " + " | ".join(v.rjust(w) for v, w in zip(values, widths)) + " |"
-                )
-
-                print(top)
-                print(header_line)
-                print(sep)
-                print(value_line)
-                print(top)
+                print_stats_table(stats, duration)
             except Exception as e:
                 print(
                     f"    Error processing {sample_file} with capacity {capacity}: {e}"
@@ -228,11 +692,20 @@ def main():
                 )  # Append 0 on error to maintain list length
             print()
 
-        # Plot results for the current dataset
+        # Keep the raw results so charts can be redrawn later with --replot-from
         dataset_name = os.path.splitext(sample_file)[0]
-        plot_and_save_results(
-            dataset_name, capacities, results_hit_ratios, output_dir, run_timestamp
-        )
+        results_path = os.path.join(output_dir, f"{dataset_name}_{run_timestamp}.npy")
+        np.save(results_path, np.array([capacities, results_hit_ratios], dtype=np.float64))
+        print(f"--- Results saved to {results_path} ---")
+
+        # Plot results for the current dataset
+        if not args.no_plot:
+            fig = plot_and_save_results(
+                dataset_name, capacities, results_hit_ratios, output_dir, run_timestamp, fig
+            )
+
+    if pool is not None:
+        pool.shutdown()
 
 
 if __name__ == "__main__":